@@ -0,0 +1,68 @@
+"""Benchmark : validation ISIN scalaire (isin_check) vs vectorisée (isin_check_bulk).
+
+    python -m benchmarks.isin_bulk --n 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.isin import LETTER_VALUES, _transcode, isin_check, isin_check_bulk
+
+ALPHABET = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"))
+
+
+def _check_digit(body):
+    digits = _transcode(body)
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        n = int(d) * (2 if i % 2 == 0 else 1)
+        total += n - 9 if n > 9 else n
+    return str((10 - total % 10) % 10)
+
+
+def generate_codes(n, invalid_ratio=0.2, seed=0):
+    rng = np.random.default_rng(seed)
+    countries = rng.choice(list(LETTER_VALUES), size=(n, 2))
+    nsins = rng.choice(ALPHABET, size=(n, 9))
+    bodies = ["".join(c) + "".join(s) for c, s in zip(countries, nsins)]
+    codes = [b + _check_digit(b) for b in bodies]
+    # Corruption d'une partie des codes : clé fausse, caractère interdit ou longueur incorrecte
+    for i in np.flatnonzero(rng.random(n) < invalid_ratio):
+        kind = i % 3
+        if kind == 0:
+            codes[i] = codes[i][:11] + str((int(codes[i][11]) + 1) % 10)
+        elif kind == 1:
+            codes[i] = codes[i][:5] + "-" + codes[i][6:]
+        else:
+            codes[i] = codes[i][:10]
+    return codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=1_000_000, help="nombre de codes générés")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    codes = generate_codes(args.n, seed=args.seed)
+
+    start = time.perf_counter()
+    scalar = [isin_check(c) for c in codes]
+    t_scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    valid, reasons = isin_check_bulk(codes)
+    t_bulk = time.perf_counter() - start
+
+    assert [v for v, _ in scalar] == valid.tolist()
+    assert [m for _, m in scalar] == reasons.tolist()
+
+    print(f"{args.n:,} codes — {int(valid.sum()):,} valides")
+    print(f"scalaire   : {t_scalar:8.3f} s  ({args.n / t_scalar:,.0f} codes/s)")
+    print(f"vectorisé  : {t_bulk:8.3f} s  ({args.n / t_bulk:,.0f} codes/s)")
+    print(f"accélération : x{t_scalar / t_bulk:.1f}")
+
+
+if __name__ == "__main__":
+    main()
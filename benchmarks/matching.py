@@ -0,0 +1,120 @@
+"""Matching équipes / joueurs : acceptation différée, contrôle de stabilité et mises à jour incrémentales.
+
+    python -m benchmarks.matching --teams 100 --players 10000 --correlations 0 0.5 0.9 --updates 20
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from utils.matching import DeferredAcceptance, random_preferences, rank_matrix
+
+def add_random_player(engine, rng):
+    engine.add_player(rng.integers(0, engine.n_players + 1, engine.n_teams), rng.permutation(engine.n_teams))
+
+
+def remove_random_player(engine, rng):
+    player = int(rng.integers(engine.n_players))
+    engine.remove_player(player)
+    return player
+
+
+def edit_player_prefs(engine, rng):
+    engine.set_player_prefs(int(rng.integers(engine.n_players)), rng.permutation(engine.n_teams))
+
+
+def edit_team_prefs(engine, rng, block=50):
+    """Mélange un bloc de `block` rangs consécutifs dans la liste d'une équipe."""
+    team = int(rng.integers(engine.n_teams))
+    order = engine.team_prefs[team].copy()
+    start = int(rng.integers(0, max(len(order) - block, 1)))
+    order[start:start + block] = rng.permutation(order[start:start + block])
+    engine.set_team_prefs(team, order)
+
+
+def edit_capacity(engine, rng):
+    team = int(rng.integers(engine.n_teams))
+    engine.set_capacity(team, max(engine.capacities[team] + int(rng.integers(-5, 6)), 0))
+
+
+# Chaque mise à jour renvoie l'indice du joueur retiré, le cas échéant
+UPDATES = {
+    "ajout d'un joueur": add_random_player,
+    "retrait d'un joueur": remove_random_player,
+    "préférences d'un joueur": edit_player_prefs,
+    "préférences d'une équipe": edit_team_prefs,
+    "capacité d'une équipe": edit_capacity,
+}
+
+
+def moved(before, after, removed=None):
+    """Joueurs présents avant et après la mise à jour dont l'équipe a changé."""
+    if removed is not None:
+        before = np.delete(before, removed)
+    n = min(len(before), len(after))
+    return int((before[:n] != after[:n]).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--teams", type=int, default=100)
+    parser.add_argument("--players", type=int, default=10_000)
+    parser.add_argument("--correlations", type=float, nargs="+", default=[0.0, 0.5, 0.9])
+    parser.add_argument("--seeds", type=int, default=3, help="instances par corrélation")
+    parser.add_argument("--updates", type=int, default=20, help="mises à jour par type (0 pour ne pas les mesurer)")
+    args = parser.parse_args()
+
+    capacity = -(-args.players // args.teams)
+    print(f"{args.teams} équipes × {args.players:,} joueurs, {capacity} places par équipe\n")
+    print(f"{'corrélation':>11} {'graine':>6} {'propositions':>12} {'matching (ms)':>13} {'contrôle (ms)':>13} {'paires bloquantes':>17}")
+    unstable = 0
+    for correlation in args.correlations:
+        for seed in range(args.seeds):
+            team_prefs, player_prefs = random_preferences(args.teams, args.players, correlation, seed)
+            start = time.perf_counter()
+            engine = DeferredAcceptance(team_prefs, rank_matrix(player_prefs), capacity).run()
+            matching = time.perf_counter() - start
+            start = time.perf_counter()
+            blocking, _ = engine.blocking_pairs()
+            check = time.perf_counter() - start
+            unstable += len(blocking)
+            print(
+                f"{correlation:>11.2f} {seed:>6} {engine.proposals:>12,} {matching * 1000:>13.1f} "
+                f"{check * 1000:>13.1f} {len(blocking):>17,}"
+            )
+
+    if args.updates:
+        # Le matching incrémental est toujours stable ; « identique » compte les mises à jour
+        # où il coïncide avec le matching optimal pour les équipes du recalcul complet.
+        print(f"\nMises à jour (corrélation {args.correlations[0]:.2f}, médianes sur {args.updates} mises à jour)")
+        print(f"{'':<25} {'incrémental (ms)':>16} {'complet (ms)':>12} {'identique':>9} {'déplacés incr.':>14} {'déplacés complet':>16}")
+        team_prefs, player_prefs = random_preferences(args.teams, args.players, args.correlations[0], 0)
+        rng = np.random.default_rng(0)
+        for name, update in UPDATES.items():
+            engine = DeferredAcceptance(team_prefs, rank_matrix(player_prefs), capacity).run()
+            incremental, full, same, moved_incremental, moved_full = [], [], 0, [], []
+            for _ in range(args.updates):
+                before = engine.player_team.copy()
+                start = time.perf_counter()
+                removed = update(engine, rng)
+                incremental.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                reference = DeferredAcceptance(engine.team_prefs, engine.player_ranks, engine.capacities).run()
+                full.append(time.perf_counter() - start)
+                blocking, _ = engine.blocking_pairs()
+                unstable += len(blocking)
+                same += np.array_equal(engine.player_team, reference.player_team)
+                moved_incremental.append(moved(before, engine.player_team, removed))
+                moved_full.append(moved(before, reference.player_team, removed))
+            print(
+                f"{name:<25} {np.median(incremental) * 1000:>16.1f} {np.median(full) * 1000:>12.1f} "
+                f"{f'{same}/{args.updates}':>9} {np.median(moved_incremental):>14.0f} {np.median(moved_full):>16.0f}"
+            )
+
+    if unstable:
+        sys.exit(f"\n{unstable:,} paires bloquantes : le moteur ne produit pas un matching stable.")
+
+
+if __name__ == "__main__":
+    main()
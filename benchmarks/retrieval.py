@@ -0,0 +1,228 @@
+"""Benchmark de recherche : CountVectorizer vs TF-IDF vs BM25 sur corpus français synthétiques.
+
+    python -m benchmarks.retrieval --sizes 1000 10000 100000 --queries 200
+
+Pour chaque taille de corpus et chaque méthode : temps de construction de l'index, pic
+mémoire (tracemalloc), latence p50/p99 d'une requête (scoring + top-k) et nDCG@k contre
+des jugements de pertinence gradués (2 = même sous-thème, 1 = même thème).
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from rank_bm25 import BM25Okapi
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from utils.bm25 import InvertedIndex, SparseBM25, top_k
+from utils.text import FrenchTokenizer, french_stopwords, token_ids
+
+# Thèmes → sous-thèmes → vocabulaire spécifique ; chaque thème a aussi un vocabulaire partagé
+TOPICS = {
+    "audit": (
+        ["audit", "contrôle", "risque", "mission", "rapport", "conformité", "auditeur", "recommandation"],
+        {
+            "interne": ["procédure", "processus", "délégation", "séparation", "tâches", "validation", "habilitation", "traçabilité"],
+            "financier": ["bilan", "comptes", "provision", "liquidité", "trésorerie", "solvabilité", "capital", "ratio"],
+            "informatique": ["système", "sécurité", "accès", "données", "sauvegarde", "serveur", "application", "cyberattaque"],
+        },
+    ),
+    "banque": (
+        ["banque", "client", "crédit", "agence", "compte", "financement", "taux", "prêt"],
+        {
+            "particuliers": ["épargne", "immobilier", "assurance", "carte", "découvert", "conseiller", "livret", "hypothèque"],
+            "entreprises": ["trésorier", "affacturage", "syndication", "garantie", "export", "investissement", "leasing", "covenant"],
+            "marchés": ["obligation", "action", "dérivé", "volatilité", "spread", "couverture", "négociation", "portefeuille"],
+        },
+    ),
+    "cuisine": (
+        ["cuisine", "recette", "plat", "saveur", "chef", "repas", "ingrédient", "cuisson"],
+        {
+            "méditerranéenne": ["olive", "tomate", "basilic", "poisson", "citron", "herbes", "légumineuses", "huile"],
+            "pâtisserie": ["farine", "beurre", "sucre", "chocolat", "crème", "tarte", "gâteau", "vanille"],
+            "terroir": ["fromage", "vin", "charcuterie", "pain", "cidre", "truffe", "canard", "lentilles"],
+        },
+    ),
+    "rh": (
+        ["salarié", "équipe", "formation", "entreprise", "management", "carrière", "talent", "emploi"],
+        {
+            "recrutement": ["candidat", "entretien", "annonce", "profil", "embauche", "sélection", "poste", "compétence"],
+            "paie": ["salaire", "prime", "cotisation", "bulletin", "congés", "absence", "rémunération", "avantage"],
+            "parcours": ["apprentissage", "module", "certification", "tuteur", "cursus", "atelier", "compétences", "évaluation"],
+        },
+    ),
+}
+SUBTOPICS = [(t, s) for t, (_, subs) in TOPICS.items() for s in subs]
+SYLLABLES = ["ra", "ti", "on", "lu", "mé", "que", "par", "ver", "sé", "dou", "cha", "ment", "ri", "bo", "gne"]
+
+# Composition d'un document : sous-thème, sous-thème voisin, vocabulaire du thème, mots vides,
+# vocabulaire de fond. Une part des documents répète un mot d'un sous-thème voisin (bourrage).
+MIX = [0.10, 0.08, 0.15, 0.30, 0.37]
+STUFFED_RATIO = 0.1
+
+
+def _background_vocabulary(rng, size=20_000):
+    words = {"".join(rng.choice(SYLLABLES, rng.integers(2, 5))) for _ in range(size)}
+    return np.array(sorted(w for w in words if len(w) > 3))
+
+
+def generate_corpus(n_docs, seed=0):
+    """Corpus synthétique : textes et sous-thème (indice dans SUBTOPICS) de chaque document."""
+    rng = np.random.default_rng(seed)
+    background = _background_vocabulary(rng)
+    zipf = 1 / np.arange(1, len(background) + 1)
+    zipf /= zipf.sum()
+    stop = np.array(sorted(french_stopwords()))
+
+    labels = rng.integers(len(SUBTOPICS), size=n_docs)
+    lengths = np.clip(rng.lognormal(3.5, 0.6, size=n_docs).astype(int), 5, 400)
+    stuffed = rng.random(n_docs) < STUFFED_RATIO
+    texts = []
+    for label, length, stuff in zip(labels, lengths, stuffed):
+        topic, sub = SUBTOPICS[label]
+        shared, subs = TOPICS[topic]
+        sibling = subs[rng.choice([s for s in subs if s != sub])]
+        counts = rng.multinomial(length, MIX)
+        words = np.concatenate([
+            rng.choice(subs[sub], counts[0]),
+            rng.choice(sibling, counts[1]),
+            rng.choice(shared, counts[2]),
+            rng.choice(stop, counts[3]),
+            rng.choice(background, counts[4], p=zipf),
+            np.repeat(rng.choice(sibling), 10 if stuff else 0),
+        ])
+        rng.shuffle(words)
+        texts.append(" ".join(words))
+    return texts, labels
+
+
+def generate_queries(n_queries, seed=1):
+    """Requêtes : 2 mots du sous-thème + 1 mot du thème, avec leur sous-thème cible."""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(len(SUBTOPICS), size=n_queries)
+    queries = []
+    for label in labels:
+        topic, sub = SUBTOPICS[label]
+        shared, subs = TOPICS[topic]
+        queries.append(" ".join([*rng.choice(subs[sub], 2, replace=False), rng.choice(shared)]))
+    return queries, labels
+
+
+def relevance(doc_labels, query_label):
+    doc_topics = np.array([t for t, _ in SUBTOPICS])[doc_labels]
+    same_topic = doc_topics == SUBTOPICS[query_label][0]
+    return np.where(doc_labels == query_label, 2, np.where(same_topic, 1, 0))
+
+
+def ndcg(ranked, gains, k):
+    discounts = 1 / np.log2(np.arange(2, k + 2))
+    dcg = ((2.0 ** gains[ranked[:k]] - 1) * discounts[:len(ranked[:k])]).sum()
+    ideal = np.sort(gains)[::-1][:k]
+    idcg = ((2.0 ** ideal - 1) * discounts[:len(ideal)]).sum()
+    return dcg / idcg if idcg > 0 else 0.0
+
+
+# Chaque méthode est construite sur les mêmes identifiants de tokens (FrenchTokenizer)
+def _sklearn_method(vectorizer_cls):
+    def build(doc_ids):
+        vectorizer = vectorizer_cls(analyzer=token_ids)
+        matrix = vectorizer.fit_transform(doc_ids)
+        return lambda query: cosine_similarity(vectorizer.transform([query]), matrix)[0]
+    return build
+
+
+def _bm25_inverted(doc_ids):
+    return InvertedIndex(doc_ids).get_scores
+
+
+def _bm25_sparse(doc_ids):
+    return SparseBM25(doc_ids).get_scores
+
+
+def _rank_bm25(doc_ids):
+    return BM25Okapi(doc_ids).get_scores
+
+
+METHODS = {
+    "CountVectorizer": _sklearn_method(CountVectorizer),
+    "TF-IDF": _sklearn_method(TfidfVectorizer),
+    "BM25 (index inversé)": _bm25_inverted,
+    "BM25 (SciPy CSR)": _bm25_sparse,
+    "BM25 (rank_bm25)": _rank_bm25,
+}
+
+
+def run(n_docs, n_queries, k, methods, rank_bm25_max, measure_memory):
+    texts, doc_labels = generate_corpus(n_docs)
+    queries, query_labels = generate_queries(n_queries)
+
+    tokenizer = FrenchTokenizer()
+    start = time.perf_counter()
+    doc_ids = [tokenizer.encode(t).tolist() for t in texts]
+    t_preprocess = time.perf_counter() - start
+    query_ids = [tokenizer.encode_query(q) for q in queries]
+    gains = [relevance(doc_labels, label) for label in query_labels]
+
+    rows = []
+    for name in methods:
+        if name == "BM25 (rank_bm25)" and n_docs > rank_bm25_max:
+            continue
+        build = METHODS[name]
+
+        peak = None
+        if measure_memory:
+            tracemalloc.start()
+            build(doc_ids)
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+        start = time.perf_counter()
+        score = build(doc_ids)
+        t_build = time.perf_counter() - start
+
+        latencies, ndcgs = [], []
+        for q, g in zip(query_ids, gains):
+            start = time.perf_counter()
+            ranked, _ = top_k(score(q), k)
+            latencies.append(time.perf_counter() - start)
+            ndcgs.append(ndcg(ranked[0], g, k))
+
+        rows.append({
+            "Documents": n_docs,
+            "Méthode": name,
+            "Tokenisation (s)": round(t_preprocess, 3),
+            "Construction (s)": round(t_build, 3),
+            "Pic mémoire (Mo)": round(peak, 1) if peak is not None else None,
+            "p50 (ms)": round(1000 * np.percentile(latencies, 50), 3),
+            "p99 (ms)": round(1000 * np.percentile(latencies, 99), 3),
+            f"nDCG@{k}": round(float(np.mean(ndcgs)), 4),
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="tailles de corpus (jusqu'à 1 000 000)")
+    parser.add_argument("--queries", type=int, default=100, help="nombre de requêtes par corpus")
+    parser.add_argument("--k", type=int, default=10, help="profondeur du top-k et du nDCG")
+    parser.add_argument("--methods", nargs="+", choices=list(METHODS), default=list(METHODS))
+    parser.add_argument("--rank-bm25-max", type=int, default=10_000,
+                        help="taille maximale de corpus pour rank_bm25 (scoring en Python pur)")
+    parser.add_argument("--no-memory", action="store_true", help="ne pas mesurer le pic mémoire")
+    parser.add_argument("--csv", help="écrire les résultats dans ce fichier CSV")
+    args = parser.parse_args()
+
+    rows = []
+    for n_docs in args.sizes:
+        rows.extend(run(n_docs, args.queries, args.k, args.methods, args.rank_bm25_max, not args.no_memory))
+        print(pd.DataFrame(rows).to_string(index=False), end="\n\n", flush=True)
+
+    if args.csv:
+        pd.DataFrame(rows).to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Tournoi : taux de victoire des IA de The Game sur des parties à graine fixée.
+
+    python -m benchmarks.the_game --games 100000 --workers 8
+"""
+import argparse
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from utils.the_game import STRATEGIES, tournament, tournament_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=10_000, help="parties par stratégie")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument("--seed", type=int, default=0, help="graine de la première partie")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunksize", type=int, default=500, help="parties par tâche du pool")
+    parser.add_argument("--csv", help="enregistre la synthèse dans ce fichier")
+    args = parser.parse_args()
+
+    results, elapsed = defaultdict(list), defaultdict(float)
+    start = time.perf_counter()
+    for name, cards_left, seconds in tournament(
+        args.strategies, args.games, args.seed, args.workers, args.chunksize
+    ):
+        results[name].extend(cards_left)
+        elapsed[name] += seconds
+    wall = time.perf_counter() - start
+
+    summary = tournament_summary(results, elapsed)
+    print(summary.to_string(index=False))
+    total = sum(len(v) for v in results.values())
+    print(f"\n{total:,} parties en {wall:.2f} s ({total / wall:,.0f} parties/s, {args.workers} processus)")
+    print("\nDistribution des cartes restantes (par tranches de 10) :")
+    print(f"  {'':<28}", " ".join(f"{f'{10 * i}-{10 * i + 9}':>6}" for i in range(10)))
+    for name, cards_left in results.items():
+        counts = np.bincount(np.asarray(cards_left) // 10, minlength=10)
+        print(f"  {name:<28}", " ".join(f"{c:>6}" for c in counts))
+    if args.csv:
+        summary.to_csv(args.csv, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,25 @@
+import os
+import time
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from rank_bm25 import BM25Okapi
-import nltk
-from nltk.corpus import stopwords
 
-nltk.download("stopwords", quiet=True)
+from utils.bm25 import (
+    InvertedIndex,
+    SparseBM25,
+    corpus_fields,
+    index_corpus,
+    iter_corpus,
+    sweep_ranks,
+    sweep_steps,
+    top_k,
+)
+from utils.text import FrenchTokenizer, token_ids
 
 st.set_page_config(layout="wide")
 st.title("🕵️ BM25 vs TF-IDF vs CountVectorizer")
@@ -80,44 +92,181 @@ k1 = st.sidebar.slider("k1 — saturation de fréquence", 1.0, 2.0, 1.5,
                         help="Plus k1 est élevé, plus les répétitions sont récompensées.")
 b = st.sidebar.slider("b — normalisation par longueur", 0.0, 1.0, 0.75,
                        help="b=1 pénalise fortement les documents longs, b=0 ne pénalise pas.")
+stem = st.sidebar.checkbox("Racinisation (Snowball)", help="risques, risque → risqu")
 
 st.sidebar.markdown("---")
 st.sidebar.subheader("Corpus")
-for doc in DOCS:
-    with st.sidebar.expander(doc["label"]):
-        st.write(doc["text"])
-        st.caption(f"💡 {doc['note']}")
+source = st.sidebar.radio("Source", ["Corpus illustratif", "Corpus importé"], label_visibility="collapsed")
+if source == "Corpus illustratif":
+    for doc in DOCS:
+        with st.sidebar.expander(doc["label"]):
+            st.write(doc["text"])
+            st.caption(f"💡 {doc['note']}")
 
 # --- Requête ---
 st.header("Requête")
 query = st.text_input("", DEFAULT_QUERY)
 
-# --- Prétraitement ---
-french_stopwords = set(stopwords.words("french"))
 
-def preprocess(text):
-    return " ".join(
-        w.lower() for w in text.split()
-        if w.lower() not in french_stopwords and len(w) > 2
+def render_sweep(index, tokens, doc_labels):
+    """Carte de chaleur du rang d'un document sur une grille (k1, b) calculée en une passe."""
+    st.header("🔥 Balayage k1 × b")
+    st.write(
+        "Rang des documents sur toute une grille de paramètres, calculé en une seule opération "
+        "vectorisée sur les fréquences et longueurs des documents qui contiennent la requête."
     )
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        k1_range = st.slider("Plage de k1", 0.0, 3.0, (0.5, 2.5))
+    with col2:
+        b_range = st.slider("Plage de b", 0.0, 1.0, (0.0, 1.0))
+    with col3:
+        steps = st.slider("Points par axe", 5, 50, 21)
+    n_docs = min(index.n_docs, int(sum(index.df[index.vocab[t]] for t in set(tokens) if t in index.vocab)))
+    if sweep_steps(steps, n_docs) < steps:
+        steps = sweep_steps(steps, n_docs)
+        st.caption(f"Grille ramenée à {steps} points par axe pour {n_docs:,} documents candidats.".replace(",", " "))
+    k1_values = np.linspace(*k1_range, steps)
+    b_values = np.linspace(*b_range, steps)
 
-texts = [doc["text"] for doc in DOCS]
-labels = [doc["label"] for doc in DOCS]
-processed_texts = [preprocess(t) for t in texts]
-processed_query = preprocess(query)
+    docs, scores = index.sweep_scores(tokens, k1_values, b_values)
+    matched = set(docs.tolist())
+    candidates = [d for d in doc_labels if d in matched]
+    if not candidates:
+        st.info("Aucun document ne contient les termes de la requête.")
+        return
+    ranks = sweep_ranks(scores)[:, :, np.searchsorted(docs, candidates)]
+
+    choice = st.selectbox("Document", range(len(candidates)), format_func=lambda i: doc_labels[candidates[i]])
+    fig = go.Figure(go.Heatmap(
+        z=ranks[:, :, choice], x=b_values, y=k1_values,
+        colorscale="RdYlGn_r", colorbar=dict(title="Rang"),
+    ))
+    fig.add_trace(go.Scatter(x=[b], y=[k1], mode="markers", name="Réglage actuel",
+                             marker=dict(symbol="x", size=12, color="black")))
+    fig.update_layout(xaxis_title="b", yaxis_title="k1", showlegend=False, margin=dict(t=20, b=0))
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(pd.DataFrame({
+        "Document": [doc_labels[d] for d in candidates],
+        "Rang min": ranks.min(axis=(0, 1)),
+        "Rang max": ranks.max(axis=(0, 1)),
+        "Top-1 (% de la grille)": (100 * (ranks == 1).mean(axis=(0, 1))).round(1),
+    }), hide_index=True, use_container_width=True)
+
+
+# --- Corpus importé : indexation incrémentale et comparaison sur le top-k ---
+if source == "Corpus importé":
+    corpus = st.session_state.setdefault(
+        "user_corpus", {"index": InvertedIndex(), "texts": [], "files": [], "stem": stem}
+    )
+    st.header("📂 Corpus importé")
+    uploaded = st.file_uploader("Corpus (JSONL ou CSV, un document par ligne)", type=["jsonl", "csv"])
+    if uploaded:
+        fmt = "jsonl" if uploaded.name.lower().endswith(".jsonl") else "csv"
+        try:
+            fields = corpus_fields(uploaded, fmt)
+        except ValueError as e:
+            st.error(f"❌ Fichier illisible : {e}")
+            st.stop()
+        if not fields:
+            st.error("❌ Le fichier ne contient aucun champ.")
+            st.stop()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            text_field = st.selectbox("Champ texte", fields, index=fields.index("text") if "text" in fields else 0)
+        with col2:
+            chunksize = st.number_input("Documents par bloc", 1_000, 100_000, 10_000, step=1_000)
+        with col3:
+            workers = st.number_input("Processus de tokenisation", 1, os.cpu_count() or 1, 1)
+
+        already = uploaded.name in corpus["files"]
+        if st.button("Ajouter au corpus", disabled=already, help="Fichier déjà indexé" if already else None):
+            def read_chunks():
+                for chunk in iter_corpus(uploaded, text_field, fmt, int(chunksize)):
+                    corpus["texts"].extend(chunk)
+                    yield chunk
+
+            progress = st.progress(0.0)
+            try:
+                for n_docs in index_corpus(read_chunks(), corpus["index"], int(workers), corpus["stem"]):
+                    progress.progress(min(uploaded.tell() / uploaded.size, 1.0), text=f"{n_docs:,} documents indexés")
+            except ValueError as e:
+                st.error(f"❌ {e}")
+            else:
+                corpus["files"].append(uploaded.name)
+
+    index = corpus["index"]
+    if not index.n_docs:
+        st.info("Chargez un fichier pour construire l'index. Chaque fichier ajouté enrichit l'index existant.")
+        st.stop()
+
+    st.caption(
+        f"{index.n_docs:,} documents ({', '.join(corpus['files'])}) · {len(index.vocab):,} termes · "
+        f"longueur moyenne {index.avgdl:.1f} tokens"
+    )
+    if corpus["stem"] != stem:
+        st.warning("Le corpus a été indexé avec un autre réglage de racinisation : videz-le pour l'appliquer.")
+    if st.button("Vider le corpus"):
+        del st.session_state.user_corpus
+        st.rerun()
+
+    k = st.slider("Top-k", 5, 50, 10)
+    tokens = FrenchTokenizer(stem=corpus["stem"]).tokenize(query)
+    rankings = {
+        "CountVectorizer": index.count_scores(tokens),
+        "TF-IDF": index.tfidf_scores(tokens),
+        "BM25": index.get_scores(tokens, k1, b),
+    }
+    top_docs = {}
+    for col, (name, scores) in zip(st.columns(3), rankings.items()):
+        docs, values = top_k(scores, k)
+        top_docs[name] = set(docs[0])
+        with col:
+            st.markdown(f"#### {name}")
+            st.dataframe(
+                pd.DataFrame({
+                    "Doc": docs[0],
+                    "Score": values[0].round(3),
+                    "Extrait": [corpus["texts"][i][:120] for i in docs[0]],
+                }),
+                hide_index=True,
+                use_container_width=True,
+            )
+
+    col1, col2 = st.columns(2)
+    for col, name in zip((col1, col2), ("CountVectorizer", "TF-IDF")):
+        common = len(top_docs[name] & top_docs["BM25"])
+        col.metric(f"Documents communs {name} / BM25", f"{common} / {k}")
+
+    bm25_top, _ = top_k(rankings["BM25"], k)
+    render_sweep(index, tokens, {int(d): f"Doc {d} — {corpus['texts'][d][:60]}" for d in bm25_top[0]})
+    st.stop()
 
-# --- Calculs ---
-count_vec = CountVectorizer()
-count_matrix = count_vec.fit_transform(processed_texts)
-count_sims = cosine_similarity(count_vec.transform([processed_query]), count_matrix)[0]
 
-tfidf_vec = TfidfVectorizer()
-tfidf_matrix = tfidf_vec.fit_transform(processed_texts)
-tfidf_sims = cosine_similarity(tfidf_vec.transform([processed_query]), tfidf_matrix)[0]
+# Index construits une fois par corpus : un rerun (slider, requête) ne refait que le scoring.
+# Les trois méthodes reçoivent les mêmes identifiants de tokens, calculés une fois par document.
+@st.cache_resource(show_spinner="Indexation du corpus…")
+def build_indexes(texts: tuple[str, ...], stem: bool):
+    tokenizer = FrenchTokenizer(stem=stem)
+    doc_ids = [tokenizer.encode(t).tolist() for t in texts]
+    count_vec = CountVectorizer(analyzer=token_ids)
+    count_matrix = count_vec.fit_transform(doc_ids)
+    tfidf_vec = TfidfVectorizer(analyzer=token_ids)
+    tfidf_matrix = tfidf_vec.fit_transform(doc_ids)
+    bm25_index = InvertedIndex(doc_ids)
+    return tokenizer, count_vec, count_matrix, tfidf_vec, tfidf_matrix, bm25_index
 
-tokenized_corpus = [doc.split() for doc in processed_texts]
-bm25 = BM25Okapi(tokenized_corpus, k1=k1, b=b)
-bm25_scores_raw = bm25.get_scores(processed_query.split())
+
+texts = tuple(doc["text"] for doc in DOCS)
+labels = [doc["label"] for doc in DOCS]
+
+# --- Calculs ---
+tokenizer, count_vec, count_matrix, tfidf_vec, tfidf_matrix, bm25_index = build_indexes(texts, stem)
+query_ids = tokenizer.encode_query(query)
+count_sims = cosine_similarity(count_vec.transform([query_ids]), count_matrix)[0]
+tfidf_sims = cosine_similarity(tfidf_vec.transform([query_ids]), tfidf_matrix)[0]
+bm25_scores_raw = bm25_index.get_scores(query_ids, k1, b)
 # Normaliser BM25 entre 0 et 1 pour comparer visuellement
 bm25_max = bm25_scores_raw.max()
 bm25_scores = bm25_scores_raw / bm25_max if bm25_max > 0 else bm25_scores_raw
@@ -156,6 +305,44 @@ df_scores = pd.DataFrame({
 })
 st.dataframe(df_scores, use_container_width=True, hide_index=True)
 
+render_sweep(bm25_index, query_ids, dict(enumerate(labels)))
+
+# --- BM25 creux vs rank_bm25 ---
+st.header("⚡ BM25 matriciel (SciPy) vs rank_bm25")
+st.write(
+    "Le même BM25 calculé par produit de matrices creuses : un lot de requêtes est scoré en une "
+    "seule multiplication au lieu d'une boucle Python par terme et par document."
+)
+col1, col2, col3 = st.columns(3)
+with col1:
+    n_docs = st.select_slider("Documents (corpus synthétique)", [1_000, 5_000, 10_000, 20_000], 5_000)
+with col2:
+    n_queries = st.select_slider("Requêtes", [10, 50, 100, 500], 50)
+with col3:
+    k = st.number_input("Top-k", 1, 20, 5)
+
+if st.button("Lancer la comparaison"):
+    rng = np.random.default_rng(0)
+    vocabulary = np.array(sorted(tokenizer.vocab))
+    synthetic = [list(rng.choice(vocabulary, rng.integers(5, 60))) for _ in range(n_docs)]
+    queries = [list(rng.choice(vocabulary, rng.integers(1, 5))) for _ in range(n_queries)]
+
+    start = time.perf_counter()
+    reference = BM25Okapi(synthetic, k1=k1, b=b)
+    ref_scores = np.array([reference.get_scores(q) for q in queries])
+    t_ref = time.perf_counter() - start
+
+    start = time.perf_counter()
+    sparse_scores = SparseBM25(synthetic).get_batch_scores(queries, k1, b)
+    top_docs, _ = top_k(sparse_scores, k)
+    t_sparse = time.perf_counter() - start
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("rank_bm25", f"{t_ref:.2f} s")
+    col2.metric("SciPy CSR (+ top-k)", f"{t_sparse:.3f} s", f"x{t_ref / t_sparse:.0f}")
+    col3.metric("Écart max. des scores", f"{np.abs(ref_scores - sparse_scores).max():.1e}")
+    st.caption(f"Top-{k} de la première requête « {' '.join(queries[0])} » : documents {top_docs[0].tolist()}")
+
 # --- Observations pédagogiques ---
 st.header("💡 Ce que révèle ce corpus")
 
@@ -1,117 +1,351 @@
+import io
+import time
+
 import streamlit as st
 import pandas as pd
+import numpy as np
+
+from utils.matching import (
+    DeferredAcceptance,
+    load_preferences,
+    preference_matrix,
+    random_preferences,
+    rank_matrix,
+    read_preferences,
+)
 
 # Configuration de base
 st.set_page_config(layout="wide")
 st.title("🎮 Système de Matching Équipes/Joueurs v2")
 st.markdown("Algorithme Gale-Shapley avec configuration dynamique")
 
-# Configuration initiale avec colonnes
-config_col1, config_col2 = st.columns(2)
-with config_col1:
-    num_teams = st.number_input("Nombre d'équipes", min_value=1, value=3, step=1)
-with config_col2:
-    num_players = st.number_input("Nombre total de joueurs", 
-                                min_value=num_teams*2, 
-                                value=12, 
-                                step=num_teams,
-                                help="Doit être un multiple du nombre d'équipes")
-
-# Validation de la configuration
-if num_players % num_teams != 0:
-    st.error(f"❌ Le nombre de joueurs doit être un multiple du nombre d'équipes (actuellement {num_players % num_teams} reste)")
-    st.stop()
+source = st.radio(
+    "Source des préférences",
+    ["Saisie manuelle", "Import CSV/Parquet", "Génération aléatoire"],
+    horizontal=True,
+)
+
+
+@st.cache_data
+def load_tables(team_data, team_fmt, player_data, player_fmt):
+    return load_preferences(
+        read_preferences(io.BytesIO(team_data), team_fmt), read_preferences(io.BytesIO(player_data), player_fmt)
+    )
+
+
+@st.cache_data
+def generate_preferences(n_teams, n_players, correlation, seed):
+    team_order, player_order = random_preferences(n_teams, n_players, correlation, seed)
+    teams = [f"Équipe {i+1}" for i in range(n_teams)]
+    players = [f"Joueur {i+1}" for i in range(n_players)]
+    return teams, players, team_order, player_order
+
+
+def file_format(uploaded):
+    return "parquet" if uploaded.name.lower().endswith(".parquet") else "csv"
+
+
+if source == "Saisie manuelle":
+    # Configuration initiale avec colonnes
+    config_col1, config_col2 = st.columns(2)
+    with config_col1:
+        num_teams = st.number_input("Nombre d'équipes", min_value=1, value=3, step=1)
+    with config_col2:
+        num_players = st.number_input("Nombre total de joueurs",
+                                    min_value=num_teams*2,
+                                    value=12,
+                                    step=num_teams,
+                                    help="Les places par équipe se règlent dans « Capacités des équipes »")
+
+    teams = [f"Équipe {i+1}" for i in range(num_teams)]
+    players = [f"Joueur {i+1}" for i in range(num_players)]
+
+    # Section des préférences
+    with st.expander("🎮 Configurer les préférences", expanded=True):
+        # Préférences des équipes avec mise en page dynamique
+        st.header("Préférences des Équipes (Coach)")
+        team_prefs = {}
+
+        # Création de lignes de 3 colonnes chacune
+        for i in range(0, len(teams), 3):
+            team_group = teams[i:i+3]
+            cols = st.columns(len(team_group))
+
+            for j, team in enumerate(team_group):
+                with cols[j]:
+                    team_prefs[team] = st.multiselect(
+                        f"{team}",
+                        players,
+                        key=f"team_{team}"
+                    )
 
-players_per_team = num_players // num_teams
-teams = [f"Équipe {i+1}" for i in range(num_teams)]
-players = [f"Joueur {i+1}" for i in range(num_players)]
-
-# Section des préférences
-with st.expander("🎮 Configurer les préférences", expanded=True):
-    # Préférences des équipes avec mise en page dynamique
-    st.header("Préférences des Équipes (Coach)")
-    team_prefs = {}
-    
-    # Création de lignes de 3 colonnes chacune
-    for i in range(0, len(teams), 3):
-        team_group = teams[i:i+3]
-        cols = st.columns(len(team_group))
-        
-        for j, team in enumerate(team_group):
-            with cols[j]:
-                team_prefs[team] = st.multiselect(
-                    f"{team}",
-                    players,
-                    key=f"team_{team}"
+        # Préférences des joueurs avec 4 colonnes par ligne
+        st.header("Préférences des Joueurs")
+        player_prefs = {}
+        player_cols = st.columns(4)
+
+        for i, player in enumerate(players):
+            with player_cols[i % 4]:
+                player_prefs[player] = st.multiselect(
+                    f"{player}",
+                    teams,
+                    key=f"player_{player}"
                 )
-                if len(team_prefs[team]) != len(players):
-                    st.error(f"⚠️ Classer tous les {len(players)} joueurs")
-
-    # Préférences des joueurs avec 4 colonnes par ligne
-    st.header("Préférences des Joueurs")
-    player_prefs = {}
-    player_cols = st.columns(4)
-    
-    for i, player in enumerate(players):
-        with player_cols[i % 4]:
-            player_prefs[player] = st.multiselect(
-                f"{player}",
-                teams,
-                key=f"player_{player}"
-            )
-            if len(player_prefs[player]) != len(teams):
-                st.error(f"⚠️ Classer toutes les {len(teams)} équipes")
-
-# Algorithme Gale-Shapley modifié
-def gale_shapley(team_prefs, player_prefs, players_per_team):
-    proposals = {team: [] for team in teams}
-    player_matches = {player: None for player in players}
-    proposed = {team: set() for team in teams}
-
-    while True:
-        active_teams = [t for t in teams if len(proposals[t]) < players_per_team and len(proposed[t]) < len(players)]
-        if not active_teams:
-            break
-
-        for team in active_teams:
-            for player in team_prefs[team]:
-                if player not in proposed[team]:
-                    proposed[team].add(player)
-                    current_team = player_matches[player]
-                    
-                    if current_team is None:
-                        proposals[team].append(player)
-                        player_matches[player] = team
-                        break
-                    else:
-                        if player_prefs[player].index(team) < player_prefs[player].index(current_team):
-                            proposals[current_team].remove(player)
-                            proposals[team].append(player)
-                            player_matches[player] = team
-                            break
-                    if len(proposals[team]) == players_per_team:
-                        break
-    return proposals, player_matches
+
+    inputs = (tuple(map(tuple, team_prefs.values())), tuple(map(tuple, player_prefs.values())))
+
+    def build_preferences():
+        # Les listes incomplètes sont complétées par des cases vides, refusées par la validation
+        team_table = pd.DataFrame.from_dict(team_prefs, orient="index").reindex(columns=range(len(players)))
+        player_table = pd.DataFrame.from_dict(player_prefs, orient="index").reindex(columns=range(len(teams)))
+        return teams, players, preference_matrix(team_table, players), preference_matrix(player_table, teams)
+
+elif source == "Import CSV/Parquet":
+    st.caption(
+        "Une ligne par équipe (ou par joueur) : la première colonne donne le nom, "
+        "les suivantes les choix du premier au dernier."
+    )
+    upload_col1, upload_col2 = st.columns(2)
+    with upload_col1:
+        team_upload = st.file_uploader("Préférences des équipes", type=["csv", "parquet"])
+    with upload_col2:
+        player_upload = st.file_uploader("Préférences des joueurs", type=["csv", "parquet"])
+    if not (team_upload and player_upload):
+        st.info("Importez les deux tables de préférences.")
+        st.stop()
+
+    try:
+        teams, players, team_order, player_order = load_tables(
+            team_upload.getvalue(), file_format(team_upload), player_upload.getvalue(), file_format(player_upload)
+        )
+    except ValueError as e:
+        st.error(f"❌ Préférences invalides : {e}")
+        st.stop()
+
+    inputs = (team_upload.file_id, player_upload.file_id)
+
+    def build_preferences():
+        return teams, players, team_order, player_order
+
+else:
+    gen_col1, gen_col2, gen_col3, gen_col4 = st.columns(4)
+    with gen_col1:
+        num_teams = st.number_input("Nombre d'équipes", min_value=1, value=100, step=1)
+    with gen_col2:
+        num_players = st.number_input("Nombre total de joueurs", min_value=num_teams, value=10_000, step=num_teams)
+    with gen_col3:
+        correlation = st.slider(
+            "Corrélation des préférences", 0.0, 1.0, 0.0, 0.05,
+            help="0 : goûts indépendants ; 1 : tout le monde a le même classement",
+        )
+    with gen_col4:
+        seed = st.number_input("Graine", min_value=0, value=0, step=1)
+
+    teams, players, team_order, player_order = generate_preferences(num_teams, num_players, correlation, seed)
+    inputs = (num_teams, num_players, correlation, seed)
+
+    def build_preferences():
+        return teams, players, team_order, player_order
+
+# Capacités : par défaut, les joueurs sont répartis au plus égal entre les équipes
+default_capacities = np.full(len(teams), len(players) // len(teams))
+default_capacities[: len(players) % len(teams)] += 1
+with st.expander("🏟️ Capacités des équipes"):
+    capacities = st.data_editor(
+        pd.DataFrame({"Équipe": teams, "Places": default_capacities}),
+        hide_index=True,
+        use_container_width=True,
+        disabled=["Équipe"],
+        column_config={"Places": st.column_config.NumberColumn(min_value=0, step=1, required=True)},
+        key=f"capacities_{source}_{len(teams)}_{len(players)}",
+    )["Places"]
+    # Une case vidée revient en NaN : convertie telle quelle, elle deviendrait −2⁶³ places
+    if capacities.isna().any():
+        st.error("❌ Chaque équipe doit avoir un nombre de places.")
+        st.stop()
+    capacities = capacities.to_numpy(dtype=int)
+    st.caption(f"{capacities.sum():,} places pour {len(players):,} joueurs".replace(",", " "))
+
+# Un matching calculé sur d'autres préférences ou capacités n'est plus affiché
+inputs = (source, inputs, tuple(capacities.tolist()))
+if st.session_state.get("matching_inputs") != inputs:
+    st.session_state.pop("matching", None)
+    st.session_state.pop("edit_team_capacity", None)
+
+
+# Algorithme Gale-Shapley : moteur par matrices de rangs (utils.matching)
+def gale_shapley(team_order, player_order, capacities):
+    return DeferredAcceptance(team_order, rank_matrix(player_order), capacities).run()
+
+
+def update_matching(update, description):
+    """Applique une mise à jour incrémentale au matching courant et note son coût."""
+    teams, players, engine, _ = st.session_state.matching
+    before = engine.player_team.copy()
+    start = time.perf_counter()
+    removed = update(teams, players, engine)
+    elapsed = time.perf_counter() - start
+    if removed is not None:
+        before = np.delete(before, removed)
+    n = min(len(before), engine.n_players)
+    moved = int((before[:n] != engine.player_team[:n]).sum())
+    st.session_state.matching = (
+        teams, players, engine,
+        f"{description} : mise à jour incrémentale en {elapsed * 1000:.1f} ms, {moved} joueur(s) changent d'équipe",
+    )
+
+
+def remove_player():
+    name = st.session_state.edit_player
+
+    def update(teams, players, engine):
+        player = players.index(name)
+        engine.remove_player(player)
+        del players[player]
+        return player
+
+    update_matching(update, f"{name} retiré")
+
+
+def add_player():
+    name = st.session_state.new_player_name.strip()
+    rank = st.session_state.new_player_rank
+
+    def update(teams, players, engine):
+        order = [teams.index(team) for team in st.session_state.new_player_prefs]
+        engine.add_player(np.full(len(teams), min(rank, len(players) + 1) - 1), order)
+        players.append(name)
+
+    update_matching(update, f"{name} ajouté")
+
+
+def edit_player_prefs():
+    name = st.session_state.edit_player
+
+    def update(teams, players, engine):
+        engine.set_player_prefs(players.index(name), [teams.index(team) for team in st.session_state.edit_player_prefs])
+
+    update_matching(update, f"Préférences de {name} modifiées")
+
+
+def select_team():
+    """Affiche la capacité actuelle de l'équipe choisie dans le champ « Places »."""
+    teams, _, engine, _ = st.session_state.matching
+    st.session_state.edit_team_capacity = int(engine.capacities[teams.index(st.session_state.edit_team)])
+
+
+def edit_capacity():
+    team = st.session_state.edit_team
+    capacity = st.session_state.edit_team_capacity
+
+    def update(teams, players, engine):
+        engine.set_capacity(teams.index(team), capacity)
+
+    update_matching(update, f"Capacité de {team} portée à {capacity}")
+
 
 # Exécution et résultats
 if st.button("🔍 Lancer le Matching"):
-    valid_teams = all(len(v) == len(players) for v in team_prefs.values())
-    valid_players = all(len(v) == len(teams) for v in player_prefs.values())
-    
-    if not (valid_teams and valid_players):
-        st.error("❌ Completez toutes les préférences avant de lancer le matching !")
-    else:
-        team_matches, player_matches = gale_shapley(team_prefs, player_prefs, players_per_team)
-        
-        # Affichage amélioré
-        st.success(f"✅ Matching réussi ! ({players_per_team} joueurs/équipe)")
-        
-        # Résumé global
-        st.subheader("Récapitulatif par Équipe")
-        for team, members in team_matches.items():
-            st.markdown(f"**{team}**: {', '.join(members)}")
-
-        # Bouton de téléchargement
-        df = pd.DataFrame.from_dict(player_matches, orient='index', columns=['Équipe'])
-        csv = df.to_csv().encode('utf-8')
-        st.download_button("📥 Télécharger les résultats", csv, "matching_results.csv", "text/csv")
\ No newline at end of file
+    try:
+        teams, players, team_order, player_order = build_preferences()
+    except ValueError as e:
+        st.error(f"❌ Préférences invalides : {e}")
+        st.stop()
+
+    start = time.perf_counter()
+    engine = gale_shapley(team_order, player_order, capacities)
+    elapsed = time.perf_counter() - start
+    st.session_state.matching_inputs = inputs
+    st.session_state.matching = (
+        list(teams), list(players), engine,
+        f"{len(teams)} équipes × {len(players):,} joueurs : {engine.proposals:,} propositions ".replace(",", " ")
+        + f"en {elapsed * 1000:.0f} ms",
+    )
+
+if "matching" not in st.session_state:
+    st.stop()
+teams, players, engine, timing = st.session_state.matching
+team_matches = {team: [players[p] for p in members] for team, members in zip(teams, engine.team_members())}
+player_matches = {player: teams[t] if t >= 0 else None for player, t in zip(players, engine.player_team)}
+
+# Vérification de la stabilité : aucune équipe et aucun joueur ne préfèrent se choisir mutuellement
+start = time.perf_counter()
+blocking_teams, blocking_players = engine.blocking_pairs()
+check_elapsed = time.perf_counter() - start
+
+# Affichage amélioré
+unmatched = int((engine.player_team < 0).sum())
+if len(blocking_teams):
+    shown = " (100 premières affichées)" if len(blocking_teams) > 100 else ""
+    st.error(f"❌ Matching instable : {len(blocking_teams):,} paire(s) bloquante(s)".replace(",", " ") + shown)
+    st.dataframe(
+        pd.DataFrame({
+            "Équipe": [teams[t] for t in blocking_teams[:100]],
+            "Joueur": [players[p] for p in blocking_players[:100]],
+            "Rang du joueur pour l'équipe": engine.team_ranks[blocking_teams[:100], blocking_players[:100]] + 1,
+            "Équipe actuelle du joueur": [player_matches[players[p]] for p in blocking_players[:100]],
+        }),
+        use_container_width=True,
+        hide_index=True,
+    )
+else:
+    st.success(
+        f"✅ Matching stable vérifié ! ({engine.capacities.min()} à {engine.capacities.max()} places par équipe, "
+        f"{unmatched} joueur(s) sans équipe, aucune paire bloquante)"
+    )
+st.caption(f"{timing}, vérification de stabilité en {check_elapsed * 1000:.0f} ms")
+
+# Modifications sans tout recalculer : l'acceptation différée reprend depuis le matching courant
+with st.expander("✏️ Modifier le matching"):
+    st.caption(
+        "Chaque modification reprend l'algorithme depuis le matching affiché : le résultat reste stable "
+        "et déplace peu de joueurs, mais peut différer d'un recalcul complet."
+    )
+    edit_col1, edit_col2, edit_col3 = st.columns(3)
+    with edit_col1:
+        st.markdown("**Joueur existant**")
+        st.selectbox("Joueur", players, key="edit_player")
+        st.button("Retirer le joueur", on_click=remove_player, disabled=len(players) <= 1)
+        edited_prefs = st.multiselect("Nouveau classement des équipes", teams, key="edit_player_prefs")
+        st.button(
+            "Appliquer le classement", on_click=edit_player_prefs, disabled=len(edited_prefs) != len(teams)
+        )
+    with edit_col2:
+        st.markdown("**Nouveau joueur**")
+        new_name = st.text_input("Nom", key="new_player_name")
+        st.number_input(
+            "Rang attribué par chaque équipe", min_value=1, value=len(players) + 1, key="new_player_rank"
+        )
+        new_prefs = st.multiselect("Classement des équipes", teams, key="new_player_prefs")
+        st.button(
+            "Ajouter le joueur",
+            on_click=add_player,
+            disabled=not new_name.strip() or new_name.strip() in players or len(new_prefs) != len(teams),
+        )
+    with edit_col3:
+        st.markdown("**Capacité d'une équipe**")
+        edited_team = st.selectbox("Équipe", teams, key="edit_team", on_change=select_team)
+        if "edit_team_capacity" not in st.session_state:
+            st.session_state.edit_team_capacity = int(engine.capacities[teams.index(edited_team)])
+        st.number_input("Places", min_value=0, key="edit_team_capacity")
+        st.button("Appliquer la capacité", on_click=edit_capacity)
+
+# Résumé global
+st.subheader("Récapitulatif par Équipe")
+if len(players) <= 100:
+    for team, members in team_matches.items():
+        st.markdown(f"**{team}**: {', '.join(members)}")
+else:
+    st.dataframe(
+        pd.DataFrame(
+            {"Équipe": teams, "Places": engine.capacities, "Joueurs": [len(m) for m in team_matches.values()],
+             "Premiers choix retenus": [", ".join(m[:5]) for m in team_matches.values()]}
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+# Bouton de téléchargement
+df = pd.DataFrame.from_dict(player_matches, orient='index', columns=['Équipe'])
+csv = df.to_csv().encode('utf-8')
+st.download_button("📥 Télécharger les résultats", csv, "matching_results.csv", "text/csv")
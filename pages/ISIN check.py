@@ -1,49 +1,30 @@
-import streamlit as st
-import string
-
-# Constante définie une fois : A=10, B=11, ..., Z=35
-LETTER_VALUES = {c: str(ord(c) - ord('A') + 10) for c in string.ascii_uppercase}
-
-
-def _transcode(isin):
-    return ''.join(LETTER_VALUES.get(c, c) for c in isin)
+import io
+import os
 
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
 
-def _validate_format(code):
-    if len(code) != 12:
-        return f"Un code ISIN doit contenir exactement 12 caractères (reçu : {len(code)})."
-    if not code[:2].isalpha():
-        return "Les 2 premiers caractères doivent être des lettres (code pays ISO)."
-    if not code[2:11].isalnum():
-        return "Les caractères 3 à 11 doivent être alphanumériques (NSIN)."
-    if not code[11].isdigit():
-        return "Le dernier caractère doit être un chiffre (clé de contrôle)."
-    return None
-
-
-def isin_check(code):
-    code = code.strip().upper()
-
-    error = _validate_format(code)
-    if error:
-        return False, error
+from utils.isin import (
+    isin_check,
+    isin_decode_bulk,
+    isin_suggestions,
+    load_isin_index,
+    screen_isin_file,
+)
 
-    digits = _transcode(code)
 
-    # Luhn mod 10 depuis la droite (check digit inclus)
-    total = 0
-    for i, d in enumerate(reversed(digits)):
-        n = int(d)
-        if i % 2 == 1:  # doubler un chiffre sur deux depuis la droite
-            n *= 2
-            if n > 9:
-                n -= 9
-        total += n
+@st.cache_resource(show_spinner="Chargement du référentiel…")
+def load_known_index(data: bytes):
+    return load_isin_index(io.BytesIO(data))
 
-    if total % 10 != 0:
-        return False, "La clé de contrôle est invalide."
-    return True, None
 
+# --- Référentiel optionnel ---
+st.sidebar.header("Référentiel")
+known_upload = st.sidebar.file_uploader("ISIN connus (un code par ligne)", type=["csv", "txt"])
+known = load_known_index(known_upload.getvalue()) if known_upload else None
+if known is not None:
+    st.sidebar.caption(f"{len(known):,} ISIN valides chargés.")
 
 # --- UI ---
 st.title("ISIN Code Validator")
@@ -54,7 +35,93 @@ user_input = st.text_input("Code ISIN :", "US0378331005", max_chars=12)
 
 if user_input:
     is_valid, message = isin_check(user_input)
+    decoded = isin_decode_bulk([user_input]).iloc[0]
     if is_valid:
         st.success(f"✅ Le code ISIN **{user_input.upper()}** est valide.")
+        if decoded["Identifiant"]:
+            st.info(f"{decoded['Identifiant']} embarqué : `{decoded['Code embarqué']}`")
+        if decoded["Anomalie"]:
+            st.warning(f"⚠️ {decoded['Anomalie']}")
     else:
         st.error(f"❌ Code invalide — {message}")
+        suggestions = isin_suggestions(user_input, known)
+        if suggestions:
+            st.write("**Corrections possibles :**")
+            for isin, edit, is_known in suggestions:
+                st.markdown(f"- `{isin}` — {edit}" + (" ✅ référentiel" if is_known else ""))
+
+# --- Validation en masse ---
+st.subheader("Validation en masse")
+bulk_input = st.text_area("Un code ISIN par ligne :", "US0378331005\nFR0000120271\nFR0000120272")
+
+codes = [line for line in bulk_input.splitlines() if line.strip()]
+if codes:
+    decoded = isin_decode_bulk(codes)
+    st.metric("Codes valides", f"{int(decoded['Valide'].sum())} / {len(codes)}")
+    st.dataframe(decoded, hide_index=True, use_container_width=True)
+
+# --- Screening de fichier ---
+st.subheader("Screening de fichier")
+st.caption(
+    "Le fichier est lu et validé par blocs : seules les lignes invalides ou en anomalie "
+    "(pays inconnu, CUSIP/SEDOL embarqué incorrect) sont conservées."
+)
+uploaded = st.file_uploader("Fichier d'ISIN (CSV ou Parquet)", type=["csv", "parquet"])
+
+if uploaded:
+    if not uploaded.size:
+        st.warning("Le fichier est vide.")
+        st.stop()
+    fmt = "parquet" if uploaded.name.lower().endswith(".parquet") else "csv"
+    if fmt == "parquet":
+        metadata = pq.ParquetFile(uploaded).metadata
+        columns, total_rows = metadata.schema.names, metadata.num_rows
+    else:
+        columns, total_rows = list(pd.read_csv(uploaded, nrows=0).columns), None
+    uploaded.seek(0)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        column = st.selectbox("Colonne ISIN", columns)
+    with col2:
+        chunksize = st.number_input("Lignes par bloc", 10_000, 1_000_000, 100_000, step=10_000)
+    with col3:
+        workers = st.number_input("Processus", 1, os.cpu_count() or 1, 1)
+    suggest = st.checkbox("Proposer une correction pour chaque ligne invalide")
+
+    if st.button("Lancer le screening"):
+        progress = st.progress(0.0)
+        rows, reports, countries = 0, [], 0
+        for size, report, counts in screen_isin_file(
+            uploaded, column, fmt, int(chunksize), int(workers), suggest, known
+        ):
+            rows += size
+            reports.append(report)
+            countries = counts + countries
+            done = rows / total_rows if total_rows else uploaded.tell() / uploaded.size
+            progress.progress(min(done, 1.0), text=f"{rows:,} lignes traitées")
+        if not rows:
+            st.session_state.pop("isin_report", None)
+            st.warning("Le fichier ne contient aucune ligne de données.")
+            st.stop()
+        st.session_state.isin_report = (
+            uploaded.name, rows, pd.concat(reports, ignore_index=True), countries[countries > 0]
+        )
+
+    report_state = st.session_state.get("isin_report")
+    if report_state and report_state[0] == uploaded.name:
+        _, rows, invalid, countries = report_state
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Lignes analysées", f"{rows:,}")
+        col2.metric("Lignes invalides", f"{int(invalid['Motif'].notna().sum()):,}")
+        col3.metric("Anomalies pays / CUSIP / SEDOL", f"{int(invalid['Anomalie'].notna().sum()):,}")
+        st.bar_chart(countries.sort_values(ascending=False).head(20))
+        if not invalid.empty:
+            reasons = pd.concat([invalid["Motif"], invalid["Anomalie"]]).value_counts()
+            st.dataframe(reasons.rename("Lignes"), use_container_width=True)
+            st.download_button(
+                "📥 Télécharger le rapport des lignes invalides",
+                invalid.to_csv(index=False).encode("utf-8"),
+                "isin_invalides.csv",
+                "text/csv",
+            )
@@ -1,6 +1,28 @@
+import io
+import time
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
+import pyarrow.parquet as pq
+
+from utils.lcr import (
+    DISTRIBUTIONS,
+    THRESHOLD,
+    LiquidityEngine,
+    breach_day,
+    correlation_matrix,
+    draw_shocks,
+    lcr_at_risk,
+    lcr_distribution,
+    merge_entity_summaries,
+    monte_carlo_lcr,
+    project_lcr,
+    reverse_stress,
+    sample_positions,
+    screen_lcr_file,
+)
 
 st.set_page_config(page_title="LCR Simulation Demo", page_icon="📈")
 
@@ -84,6 +106,29 @@ with col2:
     })
     st.dataframe(df_nof, hide_index=True)
 
+# --- Stress inverse ---
+st.write("**Stress inverse : chocs minimaux ramenant le LCR de base à 100 %**")
+directions = {
+    "Outflows seuls": [0.0, 1.0, 0.0],
+    "HQLA seuls": [-1.0, 0.0, 0.0],
+    "Inflows seuls": [0.0, 0.0, -1.0],
+}
+if factor_hqla or factor_out or factor_in:
+    directions["Direction des curseurs"] = [factor_hqla / 100, factor_out / 100, factor_in / 100]
+direction_matrix = np.array(list(directions.values()))
+multiples = reverse_stress(hqla_base, outflow_base, inflow_base, direction_matrix)
+shocks_to_breach = 100 * multiples[:, None] * direction_matrix + 0.0  # évite les « -0.0 »
+df_reverse = pd.DataFrame({
+    "Direction": list(directions),
+    "Choc HQLA (%)": shocks_to_breach[:, 0].round(2),
+    "Choc Outflows (%)": shocks_to_breach[:, 1].round(2),
+    "Choc Inflows (%)": shocks_to_breach[:, 2].round(2),
+})
+if "Direction des curseurs" in directions:
+    df_reverse["Multiple du stress courant"] = [None] * (len(directions) - 1) + [round(multiples[-1], 3)]
+st.dataframe(df_reverse, hide_index=True, use_container_width=True)
+st.caption("Cellules vides : aucune rupture atteignable dans cette direction.")
+
 if inflow_cap < inflow:
     st.warning("⚠️ Cas Inflows cappés : les entrées dépassent 75 % des sorties.")
 else:
@@ -96,21 +141,102 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+# --- Simulation Monte Carlo ---
+st.subheader("Simulation Monte Carlo des chocs")
+st.caption(
+    "Scénarios conjoints de chocs HQLA / Outflows / Inflows centrés sur les facteurs de stress "
+    "ci-dessus, avec volatilités et corrélations paramétrables."
+)
+
+if st.checkbox("Activer la simulation Monte Carlo"):
+    col1, col2 = st.columns(2)
+    with col1:
+        n_scenarios = st.select_slider(
+            "Nombre de scénarios",
+            options=[100_000, 250_000, 500_000, 1_000_000],
+            value=250_000,
+            format_func=lambda n: f"{n:,}".replace(",", " "),
+        )
+    with col2:
+        distribution = st.selectbox(
+            "Distribution des chocs",
+            DISTRIBUTIONS,
+            format_func={"normal": "Normale", "student": "Student-t", "lognormal": "Lognormale"}.get,
+        )
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        vol_hqla = st.slider("Volatilité HQLA %", 0, 50, 5)
+    with col2:
+        vol_out = st.slider("Volatilité Outflows %", 0, 50, 10)
+    with col3:
+        vol_in = st.slider("Volatilité Inflows %", 0, 50, 15)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        rho_hqla_out = st.slider("ρ HQLA / Outflows", -1.0, 1.0, -0.3, 0.05)
+    with col2:
+        rho_hqla_in = st.slider("ρ HQLA / Inflows", -1.0, 1.0, 0.0, 0.05)
+    with col3:
+        rho_out_in = st.slider("ρ Outflows / Inflows", -1.0, 1.0, 0.3, 0.05)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        dof = st.slider("Degrés de liberté (Student-t)", 3, 30, 5, disabled=distribution != "student")
+    with col2:
+        seed = st.number_input("Graine aléatoire", min_value=0, value=42, step=1)
+
+    start = time.perf_counter()
+    try:
+        shocks = draw_shocks(
+            n_scenarios,
+            means=[factor_hqla / 100, factor_out / 100, factor_in / 100],
+            vols=[vol_hqla / 100, vol_out / 100, vol_in / 100],
+            corr=correlation_matrix(rho_hqla_out, rho_hqla_in, rho_out_in),
+            distribution=distribution,
+            dof=dof,
+            seed=int(seed),
+        )
+    except ValueError as e:
+        # Matrice de corrélation invalide : seul le bloc Monte Carlo est sauté
+        st.error(str(e))
+        shocks = None
+    if shocks is not None:
+        lcr_mc = monte_carlo_lcr(hqla_base, outflow_base, inflow_base, shocks)
+        breach_prob = float(np.mean(lcr_mc < THRESHOLD))
+        at_risk = lcr_at_risk(lcr_mc)
+        edges, counts = lcr_distribution(lcr_mc)
+        elapsed = time.perf_counter() - start
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("P(LCR < 100 %)", f"{breach_prob:.2%}")
+        col2.metric("LCR médian", f"{np.median(lcr_mc):.1f} %")
+        col3.metric("Temps de calcul", f"{elapsed * 1000:.0f} ms")
+
+        fig_mc = go.Figure(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            marker_color=["#dc3545" if e < THRESHOLD else "#28a745" for e in edges[:-1]],
+        ))
+        fig_mc.add_vline(x=THRESHOLD, line_dash="dash", line_color="black", annotation_text="100 %")
+        fig_mc.update_layout(xaxis_title="LCR (%)", yaxis_title="Scénarios", showlegend=False, bargap=0)
+        st.plotly_chart(fig_mc, use_container_width=True)
+
+        st.write("**LCR-at-risk**")
+        st.dataframe(pd.DataFrame({
+            "Niveau de confiance": [f"{level:.1%}" for level in at_risk],
+            "LCR (%)": [round(v, 2) for v in at_risk.values()],
+        }), hide_index=True)
+
 # --- Simulation 30 jours ---
 st.subheader("Simulation : hausse quotidienne des Outflows sur 30 jours")
 of_factor = st.slider("Taux de hausse journalier des Outflows (%)", 0, 100, 1)
 
-days, lcr_sim, outflow_sim = [], [], []
-current_outflow = outflow  # part de l'état stressé
-
-for i in range(30):
-    current_outflow = round((1 + of_factor / 100) * current_outflow, 2)
-    current_inflow_capped = min(0.75 * current_outflow, inflow)
-    current_net = current_outflow - current_inflow_capped
-    current_lcr = round(100 * hqla / current_net, 1) if current_net > 0 else float("inf")
-    days.append(i + 1)
-    outflow_sim.append(current_outflow)
-    lcr_sim.append(current_lcr)
+HORIZON = 30
+days = np.arange(1, HORIZON + 1)
+# Projection vectorisée depuis l'état stressé : Outflows × (1 + taux)^jour
+lcr_sim = project_lcr(hqla, outflow, inflow, of_factor / 100, HORIZON)
 
 fig = go.Figure()
 fig.add_trace(go.Bar(x=days, y=lcr_sim, name="LCR (%)", marker_color=[
@@ -130,8 +256,203 @@ fig.update_layout(
 )
 st.plotly_chart(fig, use_container_width=True)
 
-breach_day = next((d for d, v in zip(days, lcr_sim) if v < 100), None)
-if breach_day:
-    st.error(f"Le LCR passe sous 100 % au jour {breach_day}.")
+first_breach = int(breach_day(hqla, outflow, inflow, of_factor / 100, HORIZON))
+if first_breach:
+    st.error(f"Le LCR passe sous 100 % au jour {first_breach}.")
 else:
     st.success("Le LCR reste au-dessus de 100 % sur les 30 jours.")
+
+# --- Surface du jour de rupture ---
+st.subheader("Jour de rupture selon le taux journalier et le stress initial")
+st.caption(
+    "Résolution analytique : le LCR passe sous 100 % dès que les sorties dépassent "
+    "min(4 × HQLA, HQLA + Inflows) ; HQLA et Inflows restent à leur valeur stressée."
+)
+col1, col2 = st.columns(2)
+with col1:
+    max_rate = st.slider("Taux journalier maximal (%)", 1, 20, 10)
+with col2:
+    stress_range = st.slider("Plage de stress initial des Outflows (%)", -100, 200, (-50, 100))
+
+rates = np.linspace(0, max_rate, 201)
+stresses = np.linspace(stress_range[0], stress_range[1], 151)
+surface = breach_day(
+    hqla, outflow_base * (1 + stresses[None, :] / 100), inflow, rates[:, None] / 100, HORIZON
+).astype(float)
+surface[surface == 0] = np.nan  # pas de rupture sur l'horizon
+
+fig_surface = go.Figure(go.Heatmap(
+    x=stresses,
+    y=rates,
+    z=surface,
+    zmin=1,
+    zmax=HORIZON,
+    colorscale="RdYlGn",
+    colorbar=dict(title="Jour"),
+    hovertemplate="Stress %{x:.1f} % · taux %{y:.2f} %/j → jour %{z}<extra></extra>",
+))
+fig_surface.add_trace(go.Scatter(
+    x=[factor_out], y=[of_factor], mode="markers",
+    marker=dict(symbol="x", size=12, color="black"), name="Paramètres courants",
+))
+fig_surface.update_layout(
+    xaxis_title="Stress initial des Outflows (%)",
+    yaxis_title="Taux de hausse journalier (%)",
+    showlegend=False,
+)
+st.plotly_chart(fig_surface, use_container_width=True)
+st.caption(
+    f"{surface.size:,} combinaisons ; zones blanches : pas de rupture sur {HORIZON} jours.".replace(",", " ")
+)
+
+# --- Calcul multi-entités ---
+st.subheader("Calcul multi-entités")
+st.caption(
+    "Fichier CSV ou Parquet avec les colonnes entity, date, hqla, outflows, inflows. Le LCR de "
+    "base et le LCR stressé (mêmes facteurs que les curseurs) sont calculés par blocs ; seules "
+    "les synthèses par entité sont conservées."
+)
+uploaded = st.file_uploader("Bilans par entité et par date", type=["csv", "parquet"])
+
+if uploaded:
+    fmt = "parquet" if uploaded.name.lower().endswith(".parquet") else "csv"
+    factors = (factor_hqla / 100, factor_out / 100, factor_in / 100)
+    chunksize = st.number_input("Lignes par bloc", 50_000, 5_000_000, 500_000, step=50_000)
+
+    if st.button("Calculer le LCR de toutes les entités"):
+        progress = st.progress(0.0)
+        total_rows = pq.ParquetFile(uploaded).metadata.num_rows if fmt == "parquet" else None
+        uploaded.seek(0)
+        rows, summaries, breaches = 0, [], pd.Series(dtype=float)
+        try:
+            for size, summary, by_date in screen_lcr_file(uploaded, fmt, int(chunksize), factors):
+                rows += size
+                summaries.append(summary)
+                breaches = breaches.add(by_date, fill_value=0)
+                done = rows / total_rows if total_rows else uploaded.tell() / uploaded.size
+                progress.progress(min(done, 1.0), text=f"{rows:,} lignes traitées")
+        except ValueError as e:
+            # Le moteur par lignes plus bas reste affiché
+            st.error(str(e))
+        else:
+            st.session_state.lcr_batch = (
+                uploaded.name, factors, rows, merge_entity_summaries(summaries), breaches
+            )
+
+    batch_state = st.session_state.get("lcr_batch")
+    if batch_state and batch_state[0] == uploaded.name:
+        _, batch_factors, rows, summary, breaches = batch_state
+        if batch_factors != factors:
+            st.warning("Les facteurs de stress ont changé depuis le calcul : relancez-le pour les appliquer.")
+        in_breach = summary["Ruptures"] > 0
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Lignes analysées", f"{rows:,}")
+        col2.metric("Entités", f"{len(summary):,}")
+        col3.metric("Entités en rupture", f"{int(in_breach.sum()):,}")
+
+        st.write("**Entités les plus fragiles (LCR stressé minimal)**")
+        st.dataframe(summary.head(20), use_container_width=True)
+        unmeasured = summary.index[summary["LCR min (%)"].isna()]
+        if len(unmeasured):
+            st.warning(
+                f"LCR non calculable (montants manquants sur toutes les lignes) pour {len(unmeasured)} "
+                f"entité(s) : {', '.join(map(str, unmeasured[:10]))}" + (" …" if len(unmeasured) > 10 else "")
+            )
+        if not breaches.empty:
+            st.write("**Entités en rupture par date**")
+            st.line_chart(breaches.sort_index().rename("Entités en rupture"))
+        st.download_button(
+            "📥 Télécharger la synthèse par entité",
+            summary.to_csv().encode("utf-8"),
+            "lcr_entites.csv",
+            "text/csv",
+        )
+
+# --- Moteur par lignes ---
+st.subheader("Moteur par lignes : niveaux HQLA et taux de run-off")
+st.caption(
+    "HQLA ventilés en Level 1 / 2A / 2B avec décotes et plafonds de composition (40 % Level 2, "
+    "15 % Level 2B) ; sorties et entrées par catégorie avec leurs taux. Modifier un facteur ne "
+    "recalcule que l'agrégat de sa catégorie."
+)
+
+
+@st.cache_data
+def load_positions(data, fmt):
+    buffer = io.BytesIO(data)
+    if fmt == "parquet":
+        return pd.read_parquet(buffer, columns=["category", "amount"])
+    return pd.read_csv(buffer, usecols=["category", "amount"], dtype={"category": str, "amount": float})
+
+
+@st.cache_data
+def synthetic_positions(n):
+    return sample_positions(n)
+
+
+positions_upload = st.file_uploader(
+    "Positions (colonnes category, amount) — à défaut, portefeuille synthétique", type=["csv", "parquet"]
+)
+if positions_upload:
+    positions_key = positions_upload.name
+    fmt = "parquet" if positions_upload.name.lower().endswith(".parquet") else "csv"
+    try:
+        positions = load_positions(positions_upload.getvalue(), fmt)
+    except ValueError as e:
+        st.error(f"Fichier de positions illisible : {e}")
+        st.stop()
+else:
+    n_positions = st.select_slider(
+        "Positions synthétiques",
+        options=[10_000, 100_000, 1_000_000, 5_000_000],
+        value=1_000_000,
+        format_func=lambda n: f"{n:,}".replace(",", " "),
+    )
+    positions_key = ("synthétique", n_positions)
+    positions = synthetic_positions(n_positions)
+
+engine_state = st.session_state.get("lcr_engine")
+if engine_state is None or engine_state[0] != positions_key:
+    start = time.perf_counter()
+    try:
+        engine = LiquidityEngine(positions)
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
+    st.session_state.lcr_engine = (positions_key, engine)
+    st.caption(f"{engine.n_positions:,} positions agrégées en {(time.perf_counter() - start) * 1000:.0f} ms.")
+engine = st.session_state.lcr_engine[1]
+
+edited = st.data_editor(
+    engine.category_table(),
+    hide_index=True,
+    use_container_width=True,
+    disabled=["Catégorie", "Type", "Niveau", "Encours brut", "Montant pondéré"],
+    column_config={
+        "Facteur": st.column_config.NumberColumn(
+            "Facteur", help="Décote (HQLA), run-off (sorties) ou taux d'entrée", min_value=0.0, max_value=1.0, step=0.01,
+            required=True,
+        ),
+        "Encours brut": st.column_config.NumberColumn(format="%.0f"),
+        "Montant pondéré": st.column_config.NumberColumn(format="%.0f"),
+    },
+    key="lcr_engine_factors",
+)
+# Une case vidée (NaN) n'est pas une modification : le facteur courant est conservé
+new_factors = edited["Facteur"].to_numpy(dtype=float)
+changed = np.flatnonzero(np.isfinite(new_factors) & (new_factors != engine.factors))
+if len(changed):
+    start = time.perf_counter()
+    for i in changed:
+        engine.set_factor(engine.categories[i], float(new_factors[i]))
+    st.caption(
+        f"{len(changed)} facteur(s) mis à jour en {(time.perf_counter() - start) * 1e6:.0f} µs, "
+        "sans relire les positions."
+    )
+
+col1, col2 = st.columns([2, 1])
+with col1:
+    st.dataframe(engine.summary().round(2), use_container_width=True)
+with col2:
+    engine_lcr = engine.lcr()
+    st.metric("LCR par lignes", f"{engine_lcr:.1f} %", delta=f"{engine_lcr - THRESHOLD:.1f} pts vs seuil")
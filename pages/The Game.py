@@ -1,6 +1,21 @@
-import streamlit as st
-import random
+import os
 import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from utils.the_game import (
+    ASCENDING,
+    STRATEGIES,
+    GameLog,
+    iter_game,
+    record_game,
+    tournament,
+    tournament_summary,
+)
 
 st.set_page_config(
     page_title="The Game",
@@ -29,94 +44,105 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-def init_game():
-    piles = {
-        "↗️ Pile ascendante 1": [1],
-        "↗️ Pile ascendante 2": [1],
-        "↙️ Pile descendante 1": [100],
-        "↙️ Pile descendante 2": [100]
-    }
-    deck = list(range(2, 100))
-    random.shuffle(deck)
-    return piles, deck
-
-
-def is_valid_move(card, pile, ascending=True):
-    top = pile[-1]
-    if ascending:
-        return card > top or card == top - 10
-    else:
-        return card < top or card == top + 10
-
-
-def has_valid_moves(hand, piles):
-    for card in hand:
-        for pile_name, pile in piles.items():
-            if is_valid_move(card, pile, ascending="↗️" in pile_name):
-                return True
-    return False
+DEFAULT_AI = "Glouton (plus petit écart)"
 
-
-def update_game_state(card, pile_key):
-    gs = st.session_state.game_state
-    gs["piles"][pile_key].append(card)
-    gs["hand"].remove(card)
-    if gs["deck"] and len(gs["hand"]) < 6:
-        gs["hand"].append(gs["deck"].pop())
-    gs["moves_this_turn"] += 1
-    st.session_state.game_state = gs
+PILE_NAMES = (
+    "↗️ Pile ascendante 1",
+    "↗️ Pile ascendante 2",
+    "↙️ Pile descendante 1",
+    "↙️ Pile descendante 2",
+)
 
 
 def end_turn():
-    gs = st.session_state.game_state
-    gs["moves_this_turn"] = 0
-    gs["turn_number"] += 1
-    st.session_state.game_state = gs  # FIX: persist state back
-
-
-def ai_make_move():
-    gs = st.session_state.game_state
-    hand, piles = gs["hand"], gs["piles"]
-
-    # Score moves: prefer smallest gap (jump-back = 0 = highest priority)
-    scored = []
-    for card in hand:
-        for pile_name, pile in piles.items():
-            ascending = "↗️" in pile_name
-            if is_valid_move(card, pile, ascending):
-                top = pile[-1]
-                if ascending:
-                    gap = card - top if card > top else 0
-                else:
-                    gap = top - card if card < top else 0
-                scored.append((gap, card, pile_name))
-
-    if scored:
-        scored.sort(key=lambda x: x[0])
-        _, card, pile_name = scored[0]
-        update_game_state(card, pile_name)
-        return True
-    return False
+    st.session_state.game_log.end_turn()
+
+
+def auto_play_game():
+    """Joue toute la fin de partie avec le moteur, en une fois ; renvoie les positions
+    successives (sommets, main, pioche, tour, coup) pour la relecture animée."""
+    log = st.session_state.game_log
+    gs = log.state
+    strategy = STRATEGIES[st.session_state.get("ai_strategy", DEFAULT_AI)]
+    frames = [(tuple(gs.tops), gs.hand_cards, gs.deck_left, gs.turn_number, None)]
+    for move in iter_game(strategy, gs):
+        log.record(move)
+        frames.append((tuple(gs.tops), gs.hand_cards, gs.deck_left, gs.turn_number, move))
+    st.session_state.game_over = True
+    return frames
+
+
+def open_replay(strategy_name, seed):
+    """Rejoue une partie de tournoi depuis sa graine et la charge dans la relecture."""
+    st.session_state.replay_log = record_game(STRATEGIES[strategy_name], seed)
+
+
+def game_animation(frames, duration):
+    """Relecture côté navigateur : une image Plotly par coup, lecture sans aller-retour serveur."""
+    labels = ["↗️ 1", "↗️ 2", "↙️ 1", "↙️ 2"]
+    colors = ["#28a745" if ascending else "#dc3545" for ascending in ASCENDING]
+
+    def caption(i, frame):
+        _, hand, deck_left, turn, move = frame
+        if i == 0:
+            action = "Position de départ"
+        elif move is None:
+            action = f"Fin du tour {turn - 1}"
+        else:
+            action = f"{move[0]} sur {PILE_NAMES[move[1]]}"
+        return f"Tour {turn} — {action}<br><sup>Main : {hand} • Pioche : {deck_left}</sup>"
+
+    def bars(tops):
+        return go.Bar(x=labels, y=tops, text=tops, textposition="outside", marker_color=colors)
+
+    fig = go.Figure(
+        data=[bars(frames[0][0])],
+        frames=[
+            go.Frame(data=[bars(f[0])], layout=go.Layout(title_text=caption(i, f)), name=str(i))
+            for i, f in enumerate(frames)
+        ],
+    )
+    fig.update_layout(
+        title_text=caption(0, frames[0]),
+        yaxis=dict(range=[0, 110], title="Sommet de la pile"),
+        showlegend=False,
+        updatemenus=[dict(
+            type="buttons",
+            direction="left",
+            x=0, y=-0.12, xanchor="left",
+            buttons=[
+                dict(label="▶ Lecture", method="animate", args=[None, dict(
+                    frame=dict(duration=duration, redraw=True), transition=dict(duration=0), fromcurrent=True
+                )]),
+                dict(label="⏸ Pause", method="animate", args=[[None], dict(
+                    frame=dict(duration=0, redraw=False), mode="immediate"
+                )]),
+            ],
+        )],
+        sliders=[dict(
+            x=0.25, len=0.75, y=-0.05,
+            currentvalue=dict(prefix="Coup "),
+            steps=[
+                dict(method="animate", label=str(i), args=[[str(i)], dict(
+                    frame=dict(duration=0, redraw=True), mode="immediate"
+                )])
+                for i in range(len(frames))
+            ],
+        )],
+    )
+    return fig
 
 
 # --- Initialization ---
-if "game_state" not in st.session_state:
-    piles, deck = init_game()
-    hand = [deck.pop() for _ in range(6)]
-    st.session_state.game_state = {
-        "piles": piles,
-        "deck": deck,
-        "hand": hand,
-        "moves_this_turn": 0,
-        "turn_number": 1,
-    }
+if not isinstance(st.session_state.get("game_log"), GameLog):
+    st.session_state.game_log = GameLog()
     st.session_state.game_over = False
     st.session_state.auto_play = False
     st.session_state.selected_card = None
 
 
 def reset_game():
-    for key in ["game_state", "game_over", "auto_play", "selected_card"]:
+    for key in ["game_log", "game_over", "auto_play", "selected_card", "replay"]:
         st.session_state.pop(key, None)
 
 
@@ -125,112 +151,211 @@ st.session_state.setdefault("game_over", False)
 st.session_state.setdefault("auto_play", False)
 st.session_state.setdefault("selected_card", None)
 
-gs = st.session_state.game_state
-piles = gs["piles"]
-deck = gs["deck"]
-hand = gs["hand"]
-moves = gs["moves_this_turn"]
-min_moves = 1 if not deck else 2
+# --- Auto-play : la fin de partie est calculée en une passe, puis relue dans le navigateur ---
+if st.session_state.auto_play and not st.session_state.game_over:
+    st.session_state.replay = auto_play_game()
+
+gs = st.session_state.game_log.state
+hand = gs.hand_cards
+moves = gs.moves_this_turn
+min_moves = gs.min_moves
 
 # Compute once per render
-can_move = has_valid_moves(hand, piles)
+can_move = gs.can_move()
 
 st.title("🎮 The Game")
 
-# --- Auto-play controls ---
-col1, col2 = st.columns([1, 1])
-with col1:
-    auto_play = st.checkbox("Auto-play (IA)", key="auto_play")
-with col2:
-    if auto_play:
-        st.slider("Vitesse (s)", 0.1, 2.0, 0.5, key="ai_speed")
-
-# --- Auto-play loop ---
-if st.session_state.auto_play and not st.session_state.game_over:
-    if can_move:
-        ai_make_move()
-        time.sleep(st.session_state.get("ai_speed", 0.5))
-        st.rerun()
-    elif moves >= min_moves:
-        end_turn()
-        st.rerun()
+tab_game, tab_replay, tab_tournament = st.tabs(["Partie", "Relecture", "Tournoi IA"])
+
+with tab_game:
+    # --- Auto-play controls ---
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        auto_play = st.checkbox("Auto-play (IA)", key="auto_play")
+        st.selectbox("IA", list(STRATEGIES), key="ai_strategy", disabled=auto_play)
+    with col2:
+        if auto_play:
+            st.slider("Vitesse (s)", 0.1, 2.0, 0.5, key="ai_speed")
+
+    # --- Piles display ---
+    replay = st.session_state.get("replay")
+    if auto_play and replay:
+        st.plotly_chart(
+            game_animation(replay, int(1000 * st.session_state.get("ai_speed", 0.5))),
+            use_container_width=True,
+        )
+        st.caption(f"{len(replay) - 1} actions calculées par le moteur et rejouées dans le navigateur.")
     else:
-        st.session_state.game_over = True
-
-# --- Piles display ---
-col_left, col_right = st.columns(2)
-with col_left:
-    st.subheader("Piles ascendantes ↗️")
-    for name, pile in piles.items():
-        if "↗️" not in name:
-            continue
-        st.markdown(f"""
-            <div class='card pile-ascending'>
-                <h3>{name}</h3>
-                <h2>{pile[-1]}</h2>
-            </div>
-        """, unsafe_allow_html=True)
-        sel = st.session_state.selected_card
-        if not auto_play and sel is not None and is_valid_move(sel, pile, ascending=True):
-            if st.button(f"Jouer {sel} ici", key=f"play_{name}"):
-                update_game_state(sel, name)
-                st.session_state.selected_card = None
-                st.rerun()
-
-with col_right:
-    st.subheader("Piles descendantes ↙️")
-    for name, pile in piles.items():
-        if "↙️" not in name:
-            continue
-        st.markdown(f"""
-            <div class='card pile-descending'>
-                <h3>{name}</h3>
-                <h2>{pile[-1]}</h2>
-            </div>
-        """, unsafe_allow_html=True)
-        sel = st.session_state.selected_card
-        if not auto_play and sel is not None and is_valid_move(sel, pile, ascending=False):
-            if st.button(f"Jouer {sel} ici", key=f"play_{name}"):
-                update_game_state(sel, name)
-                st.session_state.selected_card = None
-                st.rerun()
-
-# --- Status bar ---
-st.markdown(f"""
-    <div class='game-status' style='background-color: {"#e6f4ff" if auto_play else "#f0f2f6"}'>
-        Tour {gs['turn_number']} — Cartes jouées ce tour : {moves}/{min_moves} minimum
-        <br>Cartes restantes : {len(deck)} dans le deck • {len(hand)} en main
-    </div>
-""", unsafe_allow_html=True)
-
-# --- Manual play: hand + end turn ---
-if not auto_play and not st.session_state.game_over:
-    st.subheader("Votre main")
-    if hand:
-        cols = st.columns(len(hand))
-        for i, card in enumerate(sorted(hand)):
-            with cols[i]:
-                is_selected = st.session_state.selected_card == card
-                label = f"**[{card}]**" if is_selected else str(card)
-                if st.button(label, key=f"card_{i}_{card}"):
-                    st.session_state.selected_card = None if is_selected else card
-                    st.rerun()
-
-    if st.button("Fin de tour ✅", disabled=(moves < min_moves)):
-        end_turn()
-        st.session_state.selected_card = None
-        st.rerun()
-
-# --- Win condition ---
-if not deck and not hand:
-    st.success("🎉 Félicitations, vous avez gagné !")
-    if st.button("Nouvelle partie", key="btn_win"):
-        reset_game()
-        st.rerun()
-
-# --- Game over condition ---
-elif st.session_state.game_over or (not can_move and moves < min_moves):
-    st.error("💀 Partie terminée — Aucun mouvement possible !")
-    if st.button("Nouvelle partie", key="btn_loss"):
-        reset_game()
-        st.rerun()
+        col_left, col_right = st.columns(2)
+        for column, title, ascending in (
+            (col_left, "Piles ascendantes ↗️", True),
+            (col_right, "Piles descendantes ↙️", False),
+        ):
+            with column:
+                st.subheader(title)
+                for pile, name in enumerate(PILE_NAMES):
+                    if ASCENDING[pile] != ascending:
+                        continue
+                    st.markdown(f"""
+                        <div class='card {"pile-ascending" if ascending else "pile-descending"}'>
+                            <h3>{name}</h3>
+                            <h2>{gs.tops[pile]}</h2>
+                        </div>
+                    """, unsafe_allow_html=True)
+                    sel = st.session_state.selected_card
+                    if not auto_play and sel is not None and gs.is_valid(sel, pile):
+                        if st.button(f"Jouer {sel} ici", key=f"play_{name}"):
+                            st.session_state.game_log.play(sel, pile)
+                            st.session_state.selected_card = None
+                            st.rerun()
+
+    # --- Status bar ---
+    st.markdown(f"""
+        <div class='game-status' style='background-color: {"#e6f4ff" if auto_play else "#f0f2f6"}'>
+            Tour {gs.turn_number} — Cartes jouées ce tour : {moves}/{min_moves} minimum
+            <br>Cartes restantes : {gs.deck_left} dans le deck • {len(hand)} en main
+        </div>
+    """, unsafe_allow_html=True)
+
+    # --- Manual play: hand + end turn ---
+    if not auto_play and not st.session_state.game_over:
+        st.subheader("Votre main")
+        if hand:
+            cols = st.columns(len(hand))
+            for i, card in enumerate(hand):
+                with cols[i]:
+                    is_selected = st.session_state.selected_card == card
+                    label = f"**[{card}]**" if is_selected else str(card)
+                    if st.button(label, key=f"card_{i}_{card}"):
+                        st.session_state.selected_card = None if is_selected else card
+                        st.rerun()
+
+        if st.button("Fin de tour ✅", disabled=(moves < min_moves)):
+            end_turn()
+            st.session_state.selected_card = None
+            st.rerun()
+
+    # --- Win condition ---
+    if gs.won:
+        st.success("🎉 Félicitations, vous avez gagné !")
+        if st.button("Nouvelle partie", key="btn_win"):
+            reset_game()
+            st.rerun()
+
+    # --- Game over condition ---
+    elif st.session_state.game_over or (not can_move and moves < min_moves):
+        st.error("💀 Partie terminée — Aucun mouvement possible !")
+        if st.button("Nouvelle partie", key="btn_loss"):
+            reset_game()
+            st.rerun()
+
+
+# --- Relecture ---
+with tab_replay:
+    st.caption(
+        "Une partie est enregistrée comme sa graine suivie de 2 octets par action : le code "
+        "ci-dessous suffit pour la partager et la rejouer coup par coup."
+    )
+    st.code(st.session_state.game_log.to_code(), language=None)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        code = st.text_input("Code de partie à charger")
+    with col2:
+        st.write("")
+        load = st.button("Charger", disabled=not code)
+    if load:
+        try:
+            st.session_state.replay_log = GameLog.from_code(code)
+        except ValueError as e:
+            st.error(str(e))
+
+    if "replay_log" in st.session_state:
+        log, source = st.session_state.replay_log, "partie chargée"
+    else:
+        log, source = st.session_state.game_log, "partie en cours"
+    if len(log):
+        k = st.slider(f"Action ({source}, graine {log.seed})", 0, len(log), len(log))
+    else:
+        k = 0
+        st.info("Aucune action jouée pour l'instant.")
+    start = time.perf_counter()
+    position = log.seek(k)
+    seek_us = (time.perf_counter() - start) * 1e6
+
+    cols = st.columns(4)
+    for pile, col in enumerate(cols):
+        col.metric(PILE_NAMES[pile], position.tops[pile])
+    action = log.moves()[k - 1] if k else None
+    st.markdown(
+        f"Tour {position.turn_number} — "
+        + ("position de départ" if not k else "fin de tour" if action is None
+           else f"{action[0]} sur {PILE_NAMES[action[1]]}")
+        + f" • Main : {position.hand_cards} • Pioche : {position.deck_left}"
+    )
+    st.caption(
+        f"{len(log)} actions, {len(log.to_code())} caractères ; position reconstruite en "
+        f"{seek_us:.0f} µs depuis l'instantané le plus proche."
+    )
+
+
+# --- Tournoi des IA ---
+with tab_tournament:
+    st.caption(
+        "Parties à graine fixée, identiques pour chaque stratégie ; les blocs de parties sont "
+        "répartis sur un pool de processus."
+    )
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        n_games = st.number_input("Parties par stratégie", 100, 1_000_000, 1_000, step=100)
+    with col2:
+        workers = st.number_input("Processus", 1, os.cpu_count() or 1, os.cpu_count() or 1)
+    with col3:
+        first_seed = st.number_input("Première graine", 0, value=0)
+    strategies = st.multiselect("Stratégies", list(STRATEGIES), default=[DEFAULT_AI, "Anticipation (1 tour)"])
+
+    if st.button("Lancer le tournoi", disabled=not strategies):
+        progress = st.progress(0.0)
+        results, elapsed = defaultdict(list), defaultdict(float)
+        total = int(n_games) * len(strategies)
+        start = time.perf_counter()
+        for name, cards_left, seconds in tournament(strategies, int(n_games), int(first_seed), int(workers)):
+            results[name].extend(cards_left)
+            elapsed[name] += seconds
+            played = sum(len(v) for v in results.values())
+            progress.progress(played / total, text=f"{played:,} / {total:,} parties")
+        st.session_state.tournament = (
+            tournament_summary(results, elapsed),
+            {name: np.asarray(cards, dtype=np.uint8) for name, cards in results.items()},
+            total / (time.perf_counter() - start),
+            int(first_seed),
+        )
+
+    if "tournament" in st.session_state:
+        summary, results, throughput, first_seed = st.session_state.tournament
+        st.metric("Débit", f"{throughput:,.0f} parties/s")
+        st.dataframe(summary, hide_index=True, use_container_width=True)
+        st.write("**Distribution des cartes restantes**")
+        st.bar_chart(pd.DataFrame(
+            {name: np.bincount(cards, minlength=99) for name, cards in results.items()}
+        ).rename_axis("Cartes restantes"))
+
+        # Chaque partie se rejoue à l'identique depuis sa graine
+        st.write("**Rejouer une partie du tournoi**")
+        col1, col2 = st.columns(2)
+        with col1:
+            replay_strategy = st.selectbox("Stratégie", list(results), key="replay_strategy")
+        cards = results[replay_strategy]
+        with col2:
+            replay_seed = st.number_input(
+                "Graine (par défaut la pire partie)",
+                first_seed,
+                first_seed + len(cards) - 1,
+                first_seed + int(np.argmax(cards)),
+                key=f"replay_seed_{replay_strategy}",
+            )
+        st.button(
+            "Ouvrir dans l'onglet Relecture",
+            on_click=open_replay,
+            args=(replay_strategy, int(replay_seed)),
+            help=f"{cards[int(replay_seed) - first_seed]} cartes restantes dans cette partie.",
+        )
@@ -1,74 +1,10 @@
+import time
+
 import streamlit as st
 import cv2 as cv
 import numpy as np
-from sklearn.cluster import DBSCAN
-
-
-def detect_by_contours(image, min_w, max_w, min_h, max_h):
-    gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
-    blurred = cv.GaussianBlur(gray, (5, 5), 0)
-    edges = cv.Canny(blurred, 50, 150)
-    contours, _ = cv.findContours(edges, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
-
-    candidates = []
-    for contour in contours:
-        peri = cv.arcLength(contour, True)
-        approx = cv.approxPolyDP(contour, 0.04 * peri, True)
-        if len(approx) == 4:
-            x, y, w, h = cv.boundingRect(contour)
-            if min_w <= w <= max_w and min_h <= h <= max_h:
-                candidates.append((x, y, w, h))
-    return candidates
-
-
-def detect_by_template(image, template, threshold):
-    img_gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
-    h, w = template.shape[:2]
-    res = cv.matchTemplate(img_gray, template, cv.TM_CCOEFF_NORMED)
-    loc = np.where(res >= threshold)
-    points = list(zip(*loc[::-1]))
-
-    if not points:
-        return []
-
-    db = DBSCAN(eps=3, min_samples=1)
-    points_array = np.array(points)
-    labels = db.fit_predict(points_array)
-
-    candidates = []
-    for label in set(labels):
-        if label != -1:
-            xy = points_array[labels == label]
-            median_point = np.median(xy, axis=0).astype(int)
-            candidates.append((median_point[0], median_point[1], w, h))
-    return candidates
-
-
-def calculate_iou(box1, box2):
-    x1 = max(box1[0], box2[0])
-    y1 = max(box1[1], box2[1])
-    x2 = min(box1[0] + box1[2], box2[0] + box2[2])
-    y2 = min(box1[1] + box1[3], box2[1] + box2[3])
-    if x2 < x1 or y2 < y1:
-        return 0.0
-    inter = (x2 - x1) * (y2 - y1)
-    union = box1[2] * box1[3] + box2[2] * box2[3] - inter
-    return inter / union if union > 0 else 0.0
-
-
-def find_intersecting_boxes(boxes1, boxes2, iou_threshold):
-    robust = []
-    for b1 in boxes1:
-        for b2 in boxes2:
-            if calculate_iou(b1, b2) >= iou_threshold:
-                robust.append((
-                    int((b1[0] + b2[0]) / 2),
-                    int((b1[1] + b2[1]) / 2),
-                    int((b1[2] + b2[2]) / 2),
-                    int((b1[3] + b2[3]) / 2),
-                ))
-                break
-    return robust
+
+from utils.checkbox import detect_by_contours, detect_by_template, find_intersecting_boxes
 
 
 def load_image_from_upload(upload, flags=cv.IMREAD_COLOR):
@@ -119,10 +55,22 @@ threshold = st.sidebar.slider("Seuil template matching", 0, 100, 50) / 100
 min_w, max_w = st.sidebar.slider("Largeur des cases (px)", 0, 200, (25, 75))
 min_h, max_h = st.sidebar.slider("Hauteur des cases (px)", 0, 200, (25, 75))
 iou_threshold = st.sidebar.slider("Seuil IoU", 0, 100, 50) / 100
+peak_method = st.sidebar.radio(
+    "Extraction des cases (template)",
+    ["Maxima locaux + NMS", "DBSCAN"],
+    help="NMS : pics de la carte de corrélation puis suppression des non-maxima ; "
+    "DBSCAN : regroupement de tous les pixels au-dessus du seuil, lent sur une grande page à seuil bas",
+)
+method = "nms" if peak_method == "Maxima locaux + NMS" else "dbscan"
+nms_iou = 0.3
+if method == "nms":
+    nms_iou = st.sidebar.slider("Seuil IoU NMS", 0, 100, 30) / 100
 
 # --- Détection ---
 contour_boxes = detect_by_contours(img_rgb, min_w, max_w, min_h, max_h)
-template_boxes = detect_by_template(img_rgb, template, threshold)
+start = time.perf_counter()
+template_boxes = detect_by_template(img_rgb, template, threshold, method, nms_iou)
+template_elapsed = time.perf_counter() - start
 robust_boxes = find_intersecting_boxes(contour_boxes, template_boxes, iou_threshold)
 
 # --- Visualisation ---
@@ -131,7 +79,7 @@ result_img = img_rgb.copy()
 
 for x, y, w, h in contour_boxes:
     cv.rectangle(debug_img, (x, y), (x + w, y + h), (0, 255, 0), 1)
-for x, y, w, h in template_boxes:
+for x, y, w, h, _ in template_boxes:
     cv.rectangle(debug_img, (x, y), (x + w, y + h), (255, 0, 0), 1)
 for x, y, w, h in robust_boxes:
     cv.rectangle(result_img, (x, y), (x + w, y + h), (0, 0, 255), 2)
@@ -143,6 +91,7 @@ with col1:
     st.image(debug_img, channels="BGR", use_container_width=True)
     st.metric("Contours détectés", len(contour_boxes))
     st.metric("Templates détectés", len(template_boxes))
+    st.caption(f"Template matching ({peak_method}) en {template_elapsed * 1000:.0f} ms")
 
 with col2:
     st.subheader("Détection robuste (IoU)")
@@ -0,0 +1,273 @@
+import json
+from array import array
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from utils.parallel import bounded_map
+from utils.text import tokenize_batch
+
+# Plafond de cellules (k1, b, document) du balayage : scores et rangs restent sous ~50 Mo.
+SWEEP_MAX_CELLS = 2_000_000
+
+
+def okapi_idf(df, n_docs, epsilon=0.25):
+    """IDF de BM25Okapi (rank_bm25) : log((N − df + 0,5) / (df + 0,5)), plancher epsilon × IDF moyen."""
+    idf = np.log(n_docs - df + 0.5) - np.log(df + 0.5)
+    if len(idf):
+        idf[idf < 0] = epsilon * idf.mean()
+    return idf
+
+
+def top_k(scores, k):
+    """Indices et scores des k meilleurs documents (par ligne si `scores` est 2D), triés."""
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+class InvertedIndex:
+    """Index inversé BM25 construit une fois par corpus, puis enrichi par ajouts successifs.
+
+    Chaque terme a sa liste de postings (documents, fréquences), stockée dans des
+    `array` extensibles : add_documents n'ajoute que les postings des nouveaux
+    documents et met à jour df, IDF et longueur moyenne sans réindexer l'existant.
+    Les IDF suivent BM25Okapi de rank_bm25 (plancher epsilon × IDF moyen pour les IDF
+    négatifs) afin que les scores soient identiques. Changer k1/b ne recalcule que le
+    vecteur de normalisation par longueur ; une requête ne parcourt que les postings de
+    ses termes.
+    """
+
+    def __init__(self, tokenized_docs=(), epsilon=0.25):
+        self.epsilon = epsilon
+        self.vocab = {}
+        self._docs, self._tfs = [], []
+        self._doc_len = array("d")
+        self._sq_tf = array("d")
+        self.add_documents(tokenized_docs)
+
+    def add_documents(self, tokenized_docs):
+        df = list(self.df.astype(int)) if self._docs else []
+        for tokens in tokenized_docs:
+            doc_id = len(self._doc_len)
+            counts = Counter(tokens)
+            self._doc_len.append(len(tokens))
+            self._sq_tf.append(sum(tf * tf for tf in counts.values()))
+            for term, tf in counts.items():
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    term_id = self.vocab[term] = len(self._docs)
+                    self._docs.append(array("i"))
+                    self._tfs.append(array("d"))
+                    df.append(0)
+                self._docs[term_id].append(doc_id)
+                self._tfs[term_id].append(tf)
+                df[term_id] += 1
+
+        self.doc_len = np.array(self._doc_len)
+        self.n_docs = len(self.doc_len)
+        self.avgdl = self.doc_len.mean() if self.n_docs else 0.0
+        self.df = np.array(df, dtype=np.float64)
+        self.idf = okapi_idf(self.df, self.n_docs, self.epsilon)
+        self._norm_cache = (None, None)
+        self._tfidf_norm = None
+
+    def posting(self, term_id):
+        """(documents, fréquences) d'un terme, en tableaux NumPy."""
+        return np.array(self._docs[term_id], dtype=np.intp), np.array(self._tfs[term_id])
+
+    def length_norm(self, k1, b):
+        """k1 · (1 − b + b · |d| / avgdl), mis en cache pour le dernier couple (k1, b)."""
+        # Paramètres et normes dans un seul tuple, réassigné d'un bloc : l'index est partagé
+        # entre sessions par st.cache_resource, un lecteur ne voit jamais un couple dépareillé.
+        params, norm = self._norm_cache
+        if params != (k1, b):
+            norm = k1 * (1 - b + b * self.doc_len / self.avgdl)
+            self._norm_cache = ((k1, b), norm)
+        return norm
+
+    def get_scores(self, query_tokens, k1=1.5, b=0.75):
+        norm = self.length_norm(k1, b)
+        scores = np.zeros(self.n_docs)
+        for term in query_tokens:
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            docs, tf = self.posting(term_id)
+            scores[docs] += self.idf[term_id] * tf * (k1 + 1) / (tf + norm[docs])
+        return scores
+
+    def sweep_scores(self, query_tokens, k1_values, b_values):
+        """Scores BM25 de la requête sur toute une grille (k1, b), diffusés sur la grille b.
+
+        Seuls les documents contenant au moins un terme de la requête (les autres ont un
+        score nul) sont évalués. Les scores s'accumulent terme par terme et k1 par k1 sur les
+        seuls postings du terme : la mémoire reste celle du résultat, de forme
+        (len(k1_values), len(b_values), nombre de candidats). Retourne (documents, scores).
+        """
+        terms = [self.vocab[t] for t in query_tokens if t in self.vocab]
+        scores_shape = (len(k1_values), len(b_values))
+        if not terms:
+            return np.array([], dtype=np.intp), np.zeros(scores_shape + (0,))
+        postings = [self.posting(t) for t in terms]
+        docs = np.unique(np.concatenate([d for d, _ in postings]))
+        b = np.asarray(b_values, dtype=np.float64)[:, None]
+        relative_len = 1 - b + b * self.doc_len[docs] / self.avgdl
+
+        scores = np.zeros(scores_shape + (len(docs),))
+        for term_id, (d, tf) in zip(terms, postings):
+            # tf > 0 sur un posting : pas de 0/0 même quand k1 = 0
+            cols = np.searchsorted(docs, d)
+            for i, k1 in enumerate(np.asarray(k1_values, dtype=np.float64)):
+                scores[i][:, cols] += self.idf[term_id] * tf * (k1 + 1) / (tf + k1 * relative_len[:, cols])
+        return docs, scores
+
+    def _cosine_scores(self, query_tokens, term_weight, doc_norm):
+        counts = Counter(t for t in query_tokens if t in self.vocab)
+        scores = np.zeros(self.n_docs)
+        query_norm = 0.0
+        for term, q in counts.items():
+            term_id = self.vocab[term]
+            w = term_weight[term_id] if term_weight is not None else 1.0
+            docs, tf = self.posting(term_id)
+            scores[docs] += q * w * w * tf
+            query_norm += (q * w) ** 2
+        if not counts:
+            return scores
+        return np.divide(scores, np.sqrt(query_norm) * doc_norm, out=scores, where=doc_norm > 0)
+
+    def count_scores(self, query_tokens):
+        """Similarité cosinus sur les comptages bruts (équivalent de CountVectorizer)."""
+        return self._cosine_scores(query_tokens, None, np.sqrt(np.array(self._sq_tf)))
+
+    def sklearn_idf(self):
+        """IDF lissé de TfidfVectorizer : ln((1 + N) / (1 + df)) + 1."""
+        return np.log((1 + self.n_docs) / (1 + self.df)) + 1
+
+    def tfidf_scores(self, query_tokens):
+        """Similarité cosinus TF-IDF (équivalent de TfidfVectorizer, normalisation L2)."""
+        idf = self.sklearn_idf()
+        if self._tfidf_norm is None:
+            # Les normes dépendent de l'IDF global : recalculées une fois après chaque ajout
+            sq = np.zeros(self.n_docs)
+            for term_id in range(len(self._docs)):
+                docs, tf = self.posting(term_id)
+                sq[docs] += (tf * idf[term_id]) ** 2
+            self._tfidf_norm = np.sqrt(sq)
+        return self._cosine_scores(query_tokens, idf, self._tfidf_norm)
+
+
+class SparseBM25:
+    """BM25Okapi sur une matrice CSR termes × documents (SciPy).
+
+    Les poids BM25 de chaque (terme, document) sont calculés une fois par couple (k1, b) ;
+    un lot de requêtes est alors scoré par un seul produit creux requêtes × poids, qui
+    renvoie une matrice dense (requêtes, documents).
+    """
+
+    def __init__(self, tokenized_docs, epsilon=0.25):
+        self.vocab = {}
+        indptr, indices, data = [0], [], []
+        for tokens in tokenized_docs:
+            for term, tf in Counter(tokens).items():
+                indices.append(self.vocab.setdefault(term, len(self.vocab)))
+                data.append(tf)
+            indptr.append(len(indices))
+
+        self.n_docs = len(indptr) - 1
+        doc_term = sparse.csr_matrix(
+            (np.array(data, dtype=np.float64), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(self.n_docs, len(self.vocab)),
+        )
+        self.tf = doc_term.T.tocsr()
+        self.doc_len = np.asarray(doc_term.sum(axis=1)).ravel()
+        self.avgdl = self.doc_len.mean() if self.n_docs else 0.0
+        self.idf = okapi_idf(np.diff(self.tf.indptr).astype(np.float64), self.n_docs, epsilon)
+        self._terms = np.repeat(np.arange(len(self.vocab)), np.diff(self.tf.indptr))
+        self._weights_cache = (None, None)
+
+    def weights(self, k1=1.5, b=0.75):
+        """Matrice CSR des poids BM25 (termes × documents), mise en cache pour le dernier (k1, b)."""
+        # Un seul tuple (paramètres, matrice) : pas de couple dépareillé entre sessions.
+        params, weights = self._weights_cache
+        if params != (k1, b):
+            tf, docs = self.tf.data, self.tf.indices
+            norm = k1 * (1 - b + b * self.doc_len / self.avgdl)
+            data = self.idf[self._terms] * tf * (k1 + 1) / (tf + norm[docs])
+            weights = sparse.csr_matrix((data, docs, self.tf.indptr), shape=self.tf.shape)
+            self._weights_cache = ((k1, b), weights)
+        return weights
+
+    def query_matrix(self, queries):
+        """Requêtes tokenisées → CSR (requêtes × termes) du nombre d'occurrences des termes connus."""
+        indptr, indices = [0], []
+        for tokens in queries:
+            indices.extend(self.vocab[t] for t in tokens if t in self.vocab)
+            indptr.append(len(indices))
+        # Les doublons (terme répété dans la requête) sont sommés, comme dans rank_bm25
+        return sparse.csr_matrix(
+            (np.ones(len(indices)), indices, indptr), shape=(len(queries), len(self.vocab))
+        )
+
+    def get_batch_scores(self, queries, k1=1.5, b=0.75):
+        return (self.query_matrix(queries) @ self.weights(k1, b)).toarray()
+
+    def get_scores(self, query_tokens, k1=1.5, b=0.75):
+        return self.get_batch_scores([query_tokens], k1, b)[0]
+
+
+def sweep_steps(steps, n_docs, max_cells=SWEEP_MAX_CELLS):
+    """Points par axe ramenés pour que la grille steps² × n_docs reste sous `max_cells`."""
+    return max(2, min(steps, int(np.sqrt(max_cells / max(n_docs, 1)))))
+
+
+def sweep_ranks(scores):
+    """Rang (1 = meilleur) de chaque document pour chaque cellule d'une grille de scores."""
+    return np.argsort(np.argsort(-scores, axis=-1, kind="stable"), axis=-1) + 1
+
+
+def corpus_fields(source, fmt="csv"):
+    """Champs d'un corpus : en-tête du CSV, ou clés du premier document JSONL. Le fichier est
+    relu depuis le début ensuite."""
+    if fmt == "jsonl":
+        first = next((line for line in source if line.strip()), b"")
+        fields = list(json.loads(first)) if first else []
+    else:
+        try:
+            fields = list(pd.read_csv(source, nrows=0).columns)
+        except pd.errors.EmptyDataError:
+            fields = []
+    source.seek(0)
+    return fields
+
+
+def iter_corpus(source, text_field, fmt="csv", chunksize=10_000):
+    """Lit les textes d'un corpus CSV ou JSONL par blocs de `chunksize` documents ;
+    ValueError si un bloc n'a pas le champ `text_field`."""
+    if fmt == "jsonl":
+        reader = pd.read_json(source, lines=True, chunksize=chunksize, dtype=False)
+    else:
+        reader = pd.read_csv(source, usecols=[text_field], dtype=str, keep_default_na=False, chunksize=chunksize)
+    for chunk in reader:
+        if text_field not in chunk:
+            raise ValueError(f"Champ « {text_field} » absent du fichier.")
+        yield chunk[text_field].fillna("").astype(str).tolist()
+
+
+def index_corpus(chunks, index, workers=1, stem=False):
+    """Tokenise des blocs de textes (sur un pool de processus si workers > 1) et les ajoute à
+    `index` dans l'ordre ; produit le nombre de documents indexés après chaque bloc."""
+    if workers <= 1:
+        for texts in chunks:
+            index.add_documents(tokenize_batch(texts, stem))
+            yield index.n_docs
+        return
+
+    for _, tokens in bounded_map(tokenize_batch, ((texts, stem) for texts in chunks), workers):
+        index.add_documents(tokens)
+        yield index.n_docs
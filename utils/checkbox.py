@@ -0,0 +1,129 @@
+"""Détection de cases à cocher : contours, template matching et recoupement par IoU.
+
+Le template matching produit une carte de corrélation dont chaque case à cocher occupe
+une tache de pixels au-dessus du seuil. Deux façons d'en tirer une boîte par case :
+- "nms" : maxima locaux (la carte comparée à sa dilatation) puis suppression des
+  non-maxima par score décroissant, sur quelques centaines de pics ;
+- "dbscan" : regroupement DBSCAN de tous les pixels au-dessus du seuil, dont le nombre
+  explose sur une grande page avec un seuil bas.
+"""
+import cv2 as cv
+import numpy as np
+from sklearn.cluster import DBSCAN
+
+PEAK_METHODS = ("nms", "dbscan")
+
+
+def detect_by_contours(image, min_w, max_w, min_h, max_h):
+    gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    blurred = cv.GaussianBlur(gray, (5, 5), 0)
+    edges = cv.Canny(blurred, 50, 150)
+    contours, _ = cv.findContours(edges, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+
+    candidates = []
+    for contour in contours:
+        peri = cv.arcLength(contour, True)
+        approx = cv.approxPolyDP(contour, 0.04 * peri, True)
+        if len(approx) == 4:
+            x, y, w, h = cv.boundingRect(contour)
+            if min_w <= w <= max_w and min_h <= h <= max_h:
+                candidates.append((x, y, w, h))
+    return candidates
+
+
+def match_template(image, template):
+    """Carte de corrélation normalisée du template sur l'image en niveaux de gris."""
+    img_gray = cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    return cv.matchTemplate(img_gray, template, cv.TM_CCOEFF_NORMED)
+
+
+def local_maxima(res, threshold, size):
+    """Pics de la carte : pixels au-dessus du seuil égaux au maximum de leur voisinage
+    `size` = (hauteur, largeur). Renvoie (xs, ys, scores)."""
+    kernel = np.ones((size[0] // 2 * 2 + 1, size[1] // 2 * 2 + 1), np.uint8)
+    ys, xs = np.nonzero((res >= threshold) & (res == cv.dilate(res, kernel)))
+    return xs, ys, res[ys, xs]
+
+
+def non_max_suppression(boxes, scores, iou_threshold):
+    """Indices des boîtes (x, y, w, h) conservées : la meilleure restante élimine à chaque
+    tour toutes celles qui la recouvrent au-delà de `iou_threshold`."""
+    boxes = np.asarray(boxes, dtype=float)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2] * boxes[:, 3]
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    keep = []
+    while len(order):
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        inter = np.clip(np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None) * np.clip(
+            np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None
+        )
+        union = areas[best] + areas[rest] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        order = rest[iou < iou_threshold]
+    return np.array(keep, dtype=int)
+
+
+def template_peaks(res, w, h, threshold, method="nms", nms_iou=0.3):
+    """Boîtes (x, y, w, h, score) extraites de la carte de corrélation, une par case à cocher."""
+    if method == "nms":
+        xs, ys, scores = local_maxima(res, threshold, (h, w))
+        boxes = np.column_stack([xs, ys, np.full(len(xs), w), np.full(len(xs), h)])
+        keep = non_max_suppression(boxes, scores, nms_iou)
+        return [(int(xs[i]), int(ys[i]), w, h, float(scores[i])) for i in keep]
+    if method != "dbscan":
+        raise ValueError(f"Méthode inconnue : {method!r}.")
+
+    loc = np.where(res >= threshold)
+    points = list(zip(*loc[::-1]))
+
+    if not points:
+        return []
+
+    db = DBSCAN(eps=3, min_samples=1)
+    points_array = np.array(points)
+    labels = db.fit_predict(points_array)
+
+    candidates = []
+    for label in set(labels):
+        if label != -1:
+            xy = points_array[labels == label]
+            median_point = np.median(xy, axis=0).astype(int)
+            score = res[xy[:, 1], xy[:, 0]].max()
+            candidates.append((int(median_point[0]), int(median_point[1]), w, h, float(score)))
+    return candidates
+
+
+def detect_by_template(image, template, threshold, method="nms", nms_iou=0.3):
+    """Boîtes (x, y, w, h, score) des occurrences du template, une par case à cocher."""
+    h, w = template.shape[:2]
+    return template_peaks(match_template(image, template), w, h, threshold, method, nms_iou)
+
+
+def calculate_iou(box1, box2):
+    x1 = max(box1[0], box2[0])
+    y1 = max(box1[1], box2[1])
+    x2 = min(box1[0] + box1[2], box2[0] + box2[2])
+    y2 = min(box1[1] + box1[3], box2[1] + box2[3])
+    if x2 < x1 or y2 < y1:
+        return 0.0
+    inter = (x2 - x1) * (y2 - y1)
+    union = box1[2] * box1[3] + box2[2] * box2[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def find_intersecting_boxes(boxes1, boxes2, iou_threshold):
+    robust = []
+    for b1 in boxes1:
+        for b2 in boxes2:
+            if calculate_iou(b1, b2) >= iou_threshold:
+                robust.append((
+                    int((b1[0] + b2[0]) / 2),
+                    int((b1[1] + b2[1]) / 2),
+                    int((b1[2] + b2[2]) / 2),
+                    int((b1[3] + b2[3]) / 2),
+                ))
+                break
+    return robust
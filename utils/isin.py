@@ -0,0 +1,390 @@
+import string
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from utils.parallel import bounded_map
+
+# Constante définie une fois : A=10, B=11, ..., Z=35
+LETTER_VALUES = {c: str(ord(c) - ord('A') + 10) for c in string.ascii_uppercase}
+
+# Tables pour le chemin vectorisé, indexées par code ASCII : valeur Luhn du caractère
+# (255 = hors alphabet), 1 si sa transcription fait un seul chiffre, et contribution à la
+# somme de Luhn selon la parité du nombre de chiffres à sa droite : _LUHN[parité, code].
+_CHAR_VALUE = np.full(128, 255, dtype=np.uint8)
+_CHAR_VALUE[ord('0'):ord('9') + 1] = np.arange(10)
+_CHAR_VALUE[ord('A'):ord('Z') + 1] = np.arange(10, 36)
+_SINGLE_DIGIT = (_CHAR_VALUE < 10).astype(np.uint8)
+
+_DOUBLED = np.array([0, 2, 4, 6, 8, 1, 3, 5, 7, 9], dtype=np.uint8)
+_LUHN = np.zeros((2, 128), dtype=np.uint8)
+for _c in np.flatnonzero(_CHAR_VALUE < 36):
+    _hi, _lo = divmod(int(_CHAR_VALUE[_c]), 10)
+    _LUHN[0, _c] = _lo + _DOUBLED[_hi]
+    _LUHN[1, _c] = _DOUBLED[_lo] + _hi
+
+# Codes d'erreur du chemin vectorisé, dans l'ordre des contrôles de _validate_format
+ERR_OK, ERR_LENGTH, ERR_COUNTRY, ERR_NSIN, ERR_KEY_FORMAT, ERR_CHECKSUM = range(6)
+
+LENGTH_MESSAGE = "Un code ISIN doit contenir exactement 12 caractères (reçu : {})."
+ERROR_MESSAGES = {
+    ERR_COUNTRY: "Les 2 premiers caractères doivent être des lettres (code pays ISO).",
+    ERR_NSIN: "Les caractères 3 à 11 doivent être alphanumériques (NSIN).",
+    ERR_KEY_FORMAT: "Le dernier caractère doit être un chiffre (clé de contrôle).",
+    ERR_CHECKSUM: "La clé de contrôle est invalide.",
+}
+
+# Codes pays ISO 3166-1 alpha-2, plus les préfixes propres aux ISIN (XS international, EU, XA-XD)
+ISO_COUNTRIES = frozenset("""
+AD AE AF AG AI AL AM AO AQ AR AS AT AU AW AX AZ BA BB BD BE BF BG BH BI BJ BL BM BN BO BQ BR BS
+BT BV BW BY BZ CA CC CD CF CG CH CI CK CL CM CN CO CR CU CV CW CX CY CZ DE DJ DK DM DO DZ EC EE
+EG EH ER ES ET FI FJ FK FM FO FR GA GB GD GE GF GG GH GI GL GM GN GP GQ GR GS GT GU GW GY HK HM
+HN HR HT HU ID IE IL IM IN IO IQ IR IS IT JE JM JO JP KE KG KH KI KM KN KP KR KW KY KZ LA LB LC
+LI LK LR LS LT LU LV LY MA MC MD ME MF MG MH MK ML MM MN MO MP MQ MR MS MT MU MV MW MX MY MZ NA
+NC NE NF NG NI NL NO NP NR NU NZ OM PA PE PF PG PH PK PL PM PN PR PS PT PW PY QA RE RO RS RU RW
+SA SB SC SD SE SG SH SI SJ SK SL SM SN SO SR SS ST SV SX SY SZ TC TD TF TG TH TJ TK TL TM TN TO
+TR TT TV TW TZ UA UG UM US UY UZ VA VC VE VG VI VN VU WF WS YE YT ZA ZM ZW
+XS EU XA XB XC XD
+""".split())
+
+# Identifiants nationaux embarqués dans le NSIN : CUSIP (9 caractères) ou 00 + SEDOL (7 caractères)
+EMBEDDED_IDS = {"US": "CUSIP", "CA": "CUSIP", "GB": "SEDOL", "IE": "SEDOL"}
+
+# Tables par paire de lettres, indexées par 26 × (1re lettre) + 2e lettre
+_COUNTRY_PAIRS = np.array([a + b for a in string.ascii_uppercase for b in string.ascii_uppercase])
+_COUNTRY_KNOWN = np.isin(_COUNTRY_PAIRS, sorted(ISO_COUNTRIES))
+_EMBEDDED_KIND = np.zeros(676, dtype=np.uint8)
+for _pair, _kind in EMBEDDED_IDS.items():
+    _EMBEDDED_KIND[26 * (ord(_pair[0]) - 65) + ord(_pair[1]) - 65] = 1 if _kind == "CUSIP" else 2
+
+_CUSIP_WEIGHTS = np.array([1, 2, 1, 2, 1, 2, 1, 2], dtype=np.uint8)
+_SEDOL_WEIGHTS = np.array([1, 3, 1, 7, 3, 9], dtype=np.uint16)
+_VOWEL = np.zeros(128, dtype=bool)
+_VOWEL[[ord(c) for c in "AEIOU"]] = True
+
+ANOMALY_NONE, ANOMALY_COUNTRY, ANOMALY_CUSIP, ANOMALY_SEDOL = range(4)
+ANOMALY_MESSAGES = {
+    ANOMALY_COUNTRY: "Code pays inconnu (ISO 3166).",
+    ANOMALY_CUSIP: "Clé de contrôle du CUSIP embarqué invalide.",
+    ANOMALY_SEDOL: "SEDOL embarqué invalide (préfixe 00, voyelle ou clé).",
+}
+
+
+def _transcode(isin):
+    return ''.join(LETTER_VALUES.get(c, c) for c in isin)
+
+
+def _validate_format(code):
+    if len(code) != 12:
+        return LENGTH_MESSAGE.format(len(code))
+    if not code[:2].isalpha():
+        return ERROR_MESSAGES[ERR_COUNTRY]
+    if not code[2:11].isalnum():
+        return ERROR_MESSAGES[ERR_NSIN]
+    if not code[11].isdigit():
+        return ERROR_MESSAGES[ERR_KEY_FORMAT]
+    return None
+
+
+def isin_check(code):
+    code = code.strip().upper()
+
+    error = _validate_format(code)
+    if error:
+        return False, error
+
+    # Lettres/chiffres non ASCII (É, ², ...) : acceptés par isalpha/isdigit mais sans valeur Luhn
+    if not code.isascii():
+        return False, ERROR_MESSAGES[ERR_CHECKSUM]
+
+    digits = _transcode(code)
+
+    # Luhn mod 10 depuis la droite (check digit inclus)
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        n = int(d)
+        if i % 2 == 1:  # doubler un chiffre sur deux depuis la droite
+            n *= 2
+            if n > 9:
+                n -= 9
+        total += n
+
+    if total % 10 != 0:
+        return False, ERROR_MESSAGES[ERR_CHECKSUM]
+    return True, None
+
+
+def _normalize(codes):
+    return np.array([str(c).strip().upper() for c in codes], dtype=object)
+
+
+def _to_matrix(codes):
+    # Matrice (n, 12) des points de code ; les codes doivent tous faire 12 caractères
+    return np.asarray(codes, dtype='U12').view(np.uint32).reshape(-1, 12)
+
+
+def _luhn_error_codes(matrix):
+    values = _CHAR_VALUE[matrix]
+    is_alpha = (values >= 10) & (values < 36)
+    is_digit = values < 10
+
+    errors = np.full(len(matrix), ERR_OK, dtype=np.uint8)
+    errors[~is_digit[:, 11]] = ERR_KEY_FORMAT
+    errors[~(is_alpha | is_digit)[:, 2:11].all(axis=1)] = ERR_NSIN
+    errors[~is_alpha[:, :2].all(axis=1)] = ERR_COUNTRY
+
+    # Luhn colonne par colonne depuis la droite : 12 opérations vectorielles sur n lignes
+    ok = np.flatnonzero(errors == ERR_OK)
+    columns = np.ascontiguousarray(matrix[ok].T)
+    parity = np.zeros(len(ok), dtype=np.uint8)
+    total = np.zeros(len(ok), dtype=np.uint8)
+    for column in columns[::-1]:
+        total += np.where(parity, _LUHN[1, column], _LUHN[0, column])
+        parity ^= _SINGLE_DIGIT[column]
+    errors[ok[total % 10 != 0]] = ERR_CHECKSUM
+    return errors
+
+
+def _prepare(codes):
+    normalized = _normalize(codes)
+    lengths = np.fromiter((len(c) for c in normalized), dtype=np.int64, count=len(normalized))
+    errors = np.full(len(normalized), ERR_LENGTH, dtype=np.uint8)
+
+    idx = np.flatnonzero(lengths == 12)
+    matrix = _to_matrix(normalized[idx])
+    ascii_rows = (matrix < 128).all(axis=1)
+    rows, matrix = idx[ascii_rows], matrix[ascii_rows].astype(np.uint8)
+    errors[rows] = _luhn_error_codes(matrix)
+
+    # Caractères non ASCII : rares, délégués au chemin scalaire pour garder sa sémantique exacte
+    for i in idx[~ascii_rows]:
+        _, message = isin_check(normalized[i])
+        errors[i] = next(k for k, m in ERROR_MESSAGES.items() if m == message)
+    return normalized, errors, lengths, rows, matrix
+
+
+def _reasons(errors, lengths):
+    reasons = np.full(len(errors), None, dtype=object)
+    for code, message in ERROR_MESSAGES.items():
+        reasons[errors == code] = message
+    bad_length = errors == ERR_LENGTH
+    for n in np.unique(lengths[bad_length]):
+        reasons[bad_length & (lengths == n)] = LENGTH_MESSAGE.format(n)
+    return reasons
+
+
+def isin_error_codes(codes):
+    """Retourne (codes normalisés, codes d'erreur ERR_*, longueurs) pour un lot de codes ISIN."""
+    normalized, errors, lengths, _, _ = _prepare(codes)
+    return normalized, errors, lengths
+
+
+def isin_check_bulk(codes):
+    """Version vectorisée de isin_check : (masque de validité, motif d'erreur ou None par ligne)."""
+    _, errors, lengths = isin_error_codes(codes)
+    return errors == ERR_OK, _reasons(errors, lengths)
+
+
+def _embedded_checks(matrix, kind):
+    """Clé des CUSIP (kind 1) et SEDOL (kind 2) embarqués ; True si l'identifiant est correct."""
+    values = _CHAR_VALUE[matrix].astype(np.uint16)
+    key = values[:, 10]
+
+    cusip = values[:, 2:10] * _CUSIP_WEIGHTS
+    cusip_key = (10 - (cusip // 10 + cusip % 10).sum(axis=1) % 10) % 10
+
+    sedol_key = (10 - (values[:, 4:10] * _SEDOL_WEIGHTS).sum(axis=1) % 10) % 10
+    sedol_ok = ((matrix[:, 2] == ord('0')) & (matrix[:, 3] == ord('0'))
+                & ~_VOWEL[matrix[:, 4:11]].any(axis=1) & (sedol_key == key))
+    return np.where(kind == 1, cusip_key == key, sedol_ok)
+
+
+def isin_decode_bulk(codes):
+    """Validation, pays et identifiant embarqué (CUSIP/SEDOL) d'un lot d'ISIN en une passe.
+
+    Retourne un DataFrame (ISIN normalisé, Valide, Motif, Pays, Identifiant, Code embarqué,
+    Anomalie). Pays est catégoriel sur les 676 paires de lettres, si bien que
+    `value_counts()` donne le décompte par pays sans nouvelle boucle.
+    """
+    normalized, errors, lengths, rows, matrix = _prepare(codes)
+    n = len(normalized)
+
+    letters = ((matrix[:, :2] >= ord('A')) & (matrix[:, :2] <= ord('Z'))).all(axis=1)
+    rows, matrix = rows[letters], matrix[letters]
+    pair = 26 * (matrix[:, 0].astype(np.intp) - ord('A')) + matrix[:, 1] - ord('A')
+    country = np.full(n, -1, dtype=np.intp)
+    country[rows] = pair
+
+    anomalies = np.zeros(n, dtype=np.uint8)
+    anomalies[rows[~_COUNTRY_KNOWN[pair]]] = ANOMALY_COUNTRY
+
+    # Identifiants embarqués : seulement si le format de l'ISIN est correct
+    kind = _EMBEDDED_KIND[pair]
+    embedded = (kind > 0) & np.isin(errors[rows], (ERR_OK, ERR_CHECKSUM))
+    rows, matrix, kind = rows[embedded], matrix[embedded], kind[embedded]
+    failed = ~_embedded_checks(matrix, kind)
+    anomalies[rows[failed]] = np.where(kind[failed] == 1, ANOMALY_CUSIP, ANOMALY_SEDOL)
+
+    identifier = np.full(n, None, dtype=object)
+    identifier[rows] = np.where(kind == 1, "CUSIP", "SEDOL")
+    embedded_code = np.full(n, None, dtype=object)
+    cusip, sedol = kind == 1, kind == 2
+    embedded_code[rows[cusip]] = np.ascontiguousarray(matrix[cusip, 2:11]).view("S9").ravel().astype(str)
+    embedded_code[rows[sedol]] = np.ascontiguousarray(matrix[sedol, 4:11]).view("S7").ravel().astype(str)
+
+    anomaly_messages = np.full(n, None, dtype=object)
+    for code, message in ANOMALY_MESSAGES.items():
+        anomaly_messages[anomalies == code] = message
+
+    return pd.DataFrame({
+        "ISIN": normalized,
+        "Valide": errors == ERR_OK,
+        "Motif": _reasons(errors, lengths),
+        "Pays": pd.Categorical.from_codes(country, categories=_COUNTRY_PAIRS),
+        "Identifiant": identifier,
+        "Code embarqué": embedded_code,
+        "Anomalie": anomaly_messages,
+    })
+
+
+# Caractères admis à chaque position (pays, NSIN, clé) et alphabet des substitutions
+_ALPHABET = np.flatnonzero(_CHAR_VALUE < 36).astype(np.uint8)
+_ALLOWED = np.zeros((12, 128), dtype=bool)
+_ALLOWED[:2, ord('A'):ord('Z') + 1] = True
+_ALLOWED[2:11, _ALPHABET] = True
+_ALLOWED[11, ord('0'):ord('9') + 1] = True
+
+# Confusions de saisie fréquentes, classées avant les autres substitutions
+_CONFUSABLE = {frozenset(p) for p in ["0O", "1I", "1L", "2Z", "5S", "6G", "8B"]}
+
+
+def isin_suggestions(code, known=None, limit=5):
+    """Corrections candidates d'un code ISIN invalide : substitutions d'un caractère et
+    transpositions adjacentes qui rendent le code valide.
+
+    La somme de Luhn de chaque candidat est recalculée incrémentalement à partir des
+    sommes partielles du code d'origine (à gauche avec parité conservée ou inversée, à
+    droite inchangée). Retourne une liste de (ISIN, correction, présent dans `known`),
+    les codes connus en premier puis transpositions, clé, confusions et autres substitutions.
+    """
+    code = code.strip().upper()
+    if len(code) != 12 or not code.isascii():
+        return []
+    chars = np.frombuffer(code.encode("ascii"), dtype=np.uint8)
+    widths = 2 - _SINGLE_DIGIT[chars]
+    parity = (np.cumsum(widths[::-1])[::-1] - widths) & 1
+    contrib = _LUHN[parity, chars].astype(np.int64)
+    flipped = _LUHN[1 - parity, chars].astype(np.int64)
+    right = contrib.sum() - np.cumsum(contrib)
+    left = np.cumsum(contrib) - contrib
+    left_flipped = np.cumsum(flipped) - flipped
+
+    # Un candidat ne peut être valide que si toutes les autres positions le sont déjà
+    position_ok = _ALLOWED[np.arange(12), chars]
+    others_ok = (~position_ok).sum() - ~position_ok == 0
+
+    # Substitutions : matrice (position, caractère) des sommes de Luhn
+    flip = (2 - _SINGLE_DIGIT[_ALPHABET])[None, :] != widths[:, None]
+    total = (right[:, None] + _LUHN[parity[:, None], _ALPHABET[None, :]]
+             + np.where(flip, left_flipped[:, None], left[:, None]))
+    ok = (total % 10 == 0) & _ALLOWED[:, _ALPHABET] & others_ok[:, None]
+    ok &= _ALPHABET[None, :] != chars[:, None]
+
+    candidates = []
+    for pos, k in zip(*np.nonzero(ok)):
+        new = chr(_ALPHABET[k])
+        if pos == 11:
+            edit, rank = f"clé {code[11]} → {new}", 1
+        else:
+            edit = f"position {pos + 1} : {code[pos]} → {new}"
+            rank = 2 if frozenset(code[pos] + new) in _CONFUSABLE else 3
+        candidates.append((rank, code[:pos] + new + code[pos + 1:], edit))
+
+    # Transpositions (j, j+1) : la largeur totale de la paire est conservée, la gauche est inchangée
+    a, b = chars[:-1], chars[1:]
+    swapped_total = (right[1:] + _LUHN[parity[1:], a]
+                     + _LUHN[(parity[1:] + widths[:-1]) & 1, b] + left[:-1])
+    pos_ok = np.convolve(~position_ok, [1, 1], mode="valid") == (~position_ok).sum()
+    swap_ok = ((swapped_total % 10 == 0) & (a != b) & pos_ok
+               & _ALLOWED[np.arange(11), b] & _ALLOWED[np.arange(1, 12), a])
+    for pos in np.flatnonzero(swap_ok):
+        swapped = code[:pos] + code[pos + 1] + code[pos] + code[pos + 2:]
+        candidates.append((0, swapped, f"transposition positions {pos + 1}-{pos + 2}"))
+
+    known = known or ()
+    ranked = sorted(candidates, key=lambda c: (c[1] not in known, c[0]))
+    return [(isin, edit, isin in known) for _, isin, edit in ranked[:limit]]
+
+
+def load_isin_index(source):
+    """Index en mémoire des ISIN connus (un code par ligne ou première colonne d'un CSV)."""
+    codes = pd.read_csv(source, header=None, usecols=[0], dtype=str, keep_default_na=False)[0]
+    normalized, errors, _ = isin_error_codes(codes.to_numpy(dtype=object))
+    return frozenset(normalized[errors == ERR_OK])
+
+
+# Index des ISIN connus partagé par les processus du pool (transmis une fois à l'initialisation)
+_worker_index = None
+
+
+def _init_worker(known):
+    global _worker_index
+    _worker_index = known
+
+
+def screen_isin_chunk(codes, offset=0, suggest=False, known=None):
+    """Screening d'un bloc de codes : (lignes en erreur ou en anomalie, décompte par pays).
+
+    Le rapport donne numéro de ligne, ISIN, motif, anomalie et, si `suggest`, la meilleure
+    correction proposée par isin_suggestions pour les codes invalides.
+    """
+    decoded = isin_decode_bulk(codes)
+    flagged = np.flatnonzero(~decoded["Valide"].to_numpy() | decoded["Anomalie"].notna().to_numpy())
+    report = pd.DataFrame({
+        "Ligne": flagged + offset + 1,
+        "ISIN": np.asarray(codes, dtype=object)[flagged],
+        "Motif": decoded["Motif"].to_numpy()[flagged],
+        "Anomalie": decoded["Anomalie"].to_numpy()[flagged],
+    })
+    if suggest:
+        known = known if known is not None else _worker_index
+        best = (
+            isin_suggestions(code, known, limit=1) if motif else []
+            for code, motif in zip(report["ISIN"], report["Motif"])
+        )
+        report["Suggestion"] = [s[0][0] if s else "" for s in best]
+    return report, decoded["Pays"].value_counts(sort=False)
+
+
+def iter_isin_file(source, column, fmt="csv", chunksize=100_000):
+    """Lit une colonne d'ISIN par blocs de `chunksize` lignes (CSV ou Parquet) sans charger le fichier."""
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(source)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=[column]):
+            yield batch.column(0).to_pandas().fillna("").to_numpy(dtype=object)
+    else:
+        reader = pd.read_csv(source, usecols=[column], dtype=str, keep_default_na=False, chunksize=chunksize)
+        for chunk in reader:
+            yield chunk[column].to_numpy(dtype=object)
+
+
+def screen_isin_file(source, column, fmt="csv", chunksize=100_000, workers=1, suggest=False, known=None):
+    """Valide un fichier bloc par bloc ; produit, pour chaque bloc, (nombre de lignes, rapport,
+    décompte par pays) tels que renvoyés par screen_isin_chunk.
+
+    Avec workers > 1 les blocs sont validés sur un pool de processus.
+    """
+    def jobs():
+        offset = 0
+        for codes in iter_isin_file(source, column, fmt, chunksize):
+            yield codes, offset, suggest
+            offset += len(codes)
+
+    if workers <= 1:
+        for codes, offset, _ in jobs():
+            yield len(codes), *screen_isin_chunk(codes, offset, suggest, known)
+        return
+
+    for (codes, _, _), result in bounded_map(screen_isin_chunk, jobs(), workers, _init_worker, (known,)):
+        yield len(codes), *result
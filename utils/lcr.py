@@ -0,0 +1,426 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Plafond réglementaire des entrées : au plus 75 % des sorties viennent en déduction
+INFLOW_CAP = 0.75
+THRESHOLD = 100.0
+
+DISTRIBUTIONS = ("normal", "student", "lognormal")
+
+# Plafonds de composition des HQLA (Bâle III) : Level 2 ≤ 40 %, Level 2B ≤ 15 % du stock
+LEVEL2_CAP = 0.40
+LEVEL2B_CAP = 0.15
+
+# Paramètres par défaut du moteur par lignes : catégorie → (type, niveau HQLA, facteur).
+# Le facteur est la décote pour les HQLA, le taux de run-off pour les sorties et le taux
+# d'entrée pour les entrées.
+DEFAULT_FACTORS = {
+    "Réserves banque centrale": ("hqla", "1", 0.0),
+    "Souverains pondérés 0 %": ("hqla", "1", 0.0),
+    "Souverains pondérés 20 %": ("hqla", "2A", 0.15),
+    "Obligations sécurisées AA-": ("hqla", "2A", 0.15),
+    "Obligations d'entreprises AA-": ("hqla", "2A", 0.15),
+    "RMBS AA": ("hqla", "2B", 0.25),
+    "Obligations d'entreprises A+ à BBB-": ("hqla", "2B", 0.50),
+    "Actions": ("hqla", "2B", 0.50),
+    "Dépôts de détail stables": ("outflow", "", 0.05),
+    "Dépôts de détail moins stables": ("outflow", "", 0.10),
+    "Dépôts opérationnels": ("outflow", "", 0.25),
+    "Dépôts entreprises non opérationnels": ("outflow", "", 0.40),
+    "Financements d'institutions financières": ("outflow", "", 1.00),
+    "Facilités de crédit confirmées": ("outflow", "", 0.10),
+    "Facilités de liquidité confirmées": ("outflow", "", 0.30),
+    "Prêts à la clientèle de détail": ("inflow", "", 0.50),
+    "Prêts aux entreprises": ("inflow", "", 0.50),
+    "Prêts aux institutions financières": ("inflow", "", 1.00),
+}
+
+# Colonnes attendues dans un fichier de bilans multi-entités (une ligne par entité et par date)
+BATCH_COLUMNS = ("entity", "date", "hqla", "outflows", "inflows")
+
+
+def lcr_ratio(hqla, outflow, inflow):
+    """LCR (%) vectorisé : HQLA / (Outflows − min(75 % Outflows, Inflows)), +inf si le
+    dénominateur est nul ou négatif, NaN si l'un des montants manque."""
+    hqla, outflow, inflow = np.broadcast_arrays(
+        np.asarray(hqla, dtype=float), np.asarray(outflow, dtype=float), np.asarray(inflow, dtype=float)
+    )
+    net = outflow - np.minimum(INFLOW_CAP * outflow, inflow)
+    positive = net > 0
+    ratio = np.divide(100 * hqla, net, out=np.full(net.shape, np.inf), where=positive)
+    ratio[np.isnan(net) | np.isnan(hqla)] = np.nan
+    return ratio
+
+
+def correlation_matrix(rho_hqla_out, rho_hqla_in, rho_out_in):
+    """Matrice de corrélation 3 × 3 (HQLA, Outflows, Inflows) à partir des trois coefficients."""
+    return np.array([
+        [1.0, rho_hqla_out, rho_hqla_in],
+        [rho_hqla_out, 1.0, rho_out_in],
+        [rho_hqla_in, rho_out_in, 1.0],
+    ])
+
+
+def draw_shocks(n, means, vols, corr, distribution="normal", dof=5, seed=None):
+    """Tire `n` scénarios conjoints de chocs relatifs (HQLA, Outflows, Inflows), tableau (n, 3).
+
+    `means` et `vols` sont l'espérance et l'écart-type de chaque choc (0,1 = +10 %). La
+    dépendance passe par la décomposition de Cholesky de `corr` : normale, Student-t
+    multivariée (queues épaisses, `dof` degrés de liberté) ou lognormale (multiplicateurs
+    strictement positifs). Les multiplicateurs 1 + choc sont bornés à 0.
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Distribution inconnue : {distribution!r}.")
+    try:
+        chol = np.linalg.cholesky(np.asarray(corr, dtype=float))
+    except np.linalg.LinAlgError:
+        raise ValueError("La matrice de corrélation n'est pas définie positive.") from None
+    means = np.asarray(means, dtype=float)
+    vols = np.asarray(vols, dtype=float)
+
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n, 3)) @ chol.T
+    if distribution == "student":
+        # Mélange normal / chi² : même corrélation, variance ramenée à 1
+        w = np.sqrt(rng.chisquare(dof, size=(n, 1)) / (dof - 2))
+        z /= w
+    if distribution == "lognormal":
+        # Paramètres du log ajustés pour que le multiplicateur ait l'espérance et la volatilité demandées
+        level = np.maximum(1 + means, 1e-9)
+        sigma = np.sqrt(np.log1p((vols / level) ** 2))
+        mu = np.log(level) - sigma**2 / 2
+        z *= sigma
+        z += mu
+        np.exp(z, out=z)
+        z -= 1
+        return z
+    z *= vols
+    z += means
+    np.maximum(z, -1, out=z)
+    return z
+
+
+def monte_carlo_lcr(hqla, outflow, inflow, shocks):
+    """LCR (%) de chaque scénario : les valeurs de base multipliées par 1 + choc."""
+    factors = 1 + shocks
+    return lcr_ratio(hqla * factors[:, 0], outflow * factors[:, 1], inflow * factors[:, 2])
+
+
+def lcr_at_risk(lcr, levels=(0.95, 0.99, 0.999)):
+    """LCR-at-risk : quantile bas du LCR au niveau de confiance donné (1 − niveau)."""
+    return dict(zip(levels, np.quantile(lcr, 1 - np.asarray(levels))))
+
+
+def lcr_distribution(lcr, bins=100, upper=None):
+    """Histogramme (bornes, effectifs) du LCR, tronqué au quantile 99,9 % pour l'affichage."""
+    finite = lcr[np.isfinite(lcr)]
+    if upper is None:
+        upper = np.quantile(finite, 0.999) if len(finite) else THRESHOLD
+    counts, edges = np.histogram(np.minimum(finite, upper), bins=bins, range=(0, max(upper, THRESHOLD)))
+    return edges, counts
+
+
+def breach_outflow(hqla, inflow):
+    """Niveau de sorties au-delà duquel le LCR passe sous 100 %.
+
+    Le dénominateur est croissant en Outflows : 0,25 × Outflows tant que les entrées sont
+    cappées (Inflows ≥ 75 % Outflows), Outflows − Inflows ensuite. Le seuil vaut donc 4 × HQLA
+    dans le premier régime et HQLA + Inflows dans le second, soit min(4 × HQLA, HQLA + Inflows).
+    """
+    hqla = np.asarray(hqla, dtype=float)
+    return np.minimum(hqla / (1 - INFLOW_CAP), hqla + np.asarray(inflow, dtype=float))
+
+
+def project_lcr(hqla, outflow, inflow, rates, horizon=30):
+    """LCR (%) jour par jour quand les sorties croissent géométriquement au taux journalier
+    `rates` (0,01 = +1 %/jour), HQLA et Inflows constants ; forme rates.shape + (horizon,)."""
+    rates = np.asarray(rates, dtype=float)[..., None]
+    days = np.arange(1, horizon + 1)
+    outflows = np.asarray(outflow, dtype=float)[..., None] * (1 + rates) ** days
+    return lcr_ratio(np.asarray(hqla, dtype=float)[..., None], outflows, np.asarray(inflow, dtype=float)[..., None])
+
+
+def breach_day(hqla, outflow, inflow, rates, horizon=30):
+    """Premier jour (1..horizon) où le LCR passe sous 100 %, calculé analytiquement :
+    plus petit t ≥ 1 tel que Outflows × (1 + taux)^t > seuil. 0 si aucune rupture sur
+    l'horizon. Les arguments sont diffusés (broadcast) les uns contre les autres."""
+    hqla, outflow, inflow, rates = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (hqla, outflow, inflow, rates))
+    )
+    threshold = breach_outflow(hqla, inflow)
+    growth = np.log1p(rates)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        day = np.floor(np.log(threshold / outflow) / growth) + 1
+    day = np.where(outflow > threshold, 1, day)
+    day = np.where((outflow <= threshold) & (growth <= 0), np.inf, day)
+    day = np.where(np.isnan(day), np.inf, day)
+    return np.where(day <= horizon, day, 0).astype(int)
+
+
+def iter_balance_sheets(source, fmt="csv", chunksize=500_000):
+    """Lit un fichier (entity, date, hqla, outflows, inflows) par blocs de `chunksize` lignes,
+    en CSV ou Parquet, sans le charger entièrement."""
+    if fmt == "parquet":
+        parquet = pq.ParquetFile(source)
+        missing = set(BATCH_COLUMNS) - set(parquet.schema.names)
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {', '.join(sorted(missing))}.")
+        batches = (b.to_pandas() for b in parquet.iter_batches(batch_size=chunksize, columns=list(BATCH_COLUMNS)))
+    else:
+        header = pd.read_csv(source, nrows=0).columns
+        missing = set(BATCH_COLUMNS) - set(header)
+        if missing:
+            raise ValueError(f"Colonnes manquantes : {', '.join(sorted(missing))}.")
+        if hasattr(source, "seek"):
+            source.seek(0)
+        batches = pd.read_csv(
+            source,
+            usecols=list(BATCH_COLUMNS),
+            dtype={"entity": str, "hqla": float, "outflows": float, "inflows": float},
+            chunksize=chunksize,
+        )
+    for chunk in batches:
+        chunk["entity"] = chunk["entity"].astype(str)
+        chunk["date"] = pd.to_datetime(chunk["date"])
+        yield chunk
+
+
+def lcr_batch(frame, factors=(0.0, 0.0, 0.0)):
+    """Calcule en une passe colonne par colonne le LCR de base et stressé de chaque ligne.
+
+    `factors` sont les chocs relatifs (HQLA, Outflows, Inflows) des curseurs. Ajoute
+    net_outflow_base, lcr_base, net_outflow (stressé), capped (entrées plafonnées à 75 %
+    des sorties stressées), lcr (stressé), breach (LCR stressé < 100 %) et outflow_margin
+    (hausse relative des sorties stressées qui ramènerait le LCR à 100 %, cf. reverse_stress).
+    """
+    hqla = frame["hqla"].to_numpy(dtype=float)
+    outflows = frame["outflows"].to_numpy(dtype=float)
+    inflows = frame["inflows"].to_numpy(dtype=float)
+    f_hqla, f_out, f_in = (1 + np.asarray(factors, dtype=float)).tolist()
+
+    stressed_out = outflows * f_out
+    stressed_in = inflows * f_in
+    cap = INFLOW_CAP * stressed_out
+    lcr = lcr_ratio(hqla * f_hqla, stressed_out, stressed_in)
+    return frame.assign(
+        net_outflow_base=outflows - np.minimum(INFLOW_CAP * outflows, inflows),
+        lcr_base=lcr_ratio(hqla, outflows, inflows),
+        net_outflow=stressed_out - np.minimum(cap, stressed_in),
+        capped=stressed_in > cap,
+        lcr=lcr,
+        breach=lcr < THRESHOLD,
+        outflow_margin=reverse_stress(hqla * f_hqla, stressed_out, stressed_in, [0.0, 1.0, 0.0]),
+    )
+
+
+def summarize_entities(batch):
+    """Synthèse par entité d'un bloc calculé par lcr_batch : observations, ruptures, LCR
+    stressé minimal et sa date, première date de rupture, marge minimale sur les sorties.
+
+    Le LCR minimal ne porte que sur les lignes où il est calculable : une entité dont toutes
+    les lignes ont des montants manquants garde un LCR min et une date vides."""
+    groups = batch.groupby("entity", sort=False)
+    measured = batch.loc[batch["lcr"].notna()]
+    worst_rows = measured.groupby("entity", sort=False)["lcr"].idxmin()
+    worst = measured.loc[worst_rows, ["entity", "lcr", "date"]].set_index("entity")
+    first_breach = batch.loc[batch["breach"]].groupby("entity")["date"].min()
+    return pd.DataFrame({
+        "Observations": groups.size(),
+        "Ruptures": groups["breach"].sum(),
+        "LCR min (%)": worst["lcr"],
+        "Date du LCR min": worst["date"],
+        "Première rupture": first_breach,
+        "Marge Outflows min (%)": 100 * groups["outflow_margin"].min(),
+    }).rename_axis("Entité")
+
+
+def merge_entity_summaries(summaries):
+    """Fusionne les synthèses par entité de plusieurs blocs ; trie par LCR minimal croissant."""
+    stacked = pd.concat(summaries).sort_values("LCR min (%)", kind="stable")
+    groups = stacked.groupby(level=0, sort=False)
+    worst = groups[["LCR min (%)", "Date du LCR min"]].first()
+    return pd.DataFrame({
+        "Observations": groups["Observations"].sum(),
+        "Ruptures": groups["Ruptures"].sum(),
+        "LCR min (%)": worst["LCR min (%)"],
+        "Date du LCR min": worst["Date du LCR min"],
+        "Première rupture": groups["Première rupture"].min(),
+        "Marge Outflows min (%)": groups["Marge Outflows min (%)"].min(),
+    }).rename_axis("Entité")
+
+
+def screen_lcr_file(source, fmt="csv", chunksize=500_000, factors=(0.0, 0.0, 0.0)):
+    """Calcule le LCR d'un fichier multi-entités bloc par bloc ; produit, pour chaque bloc,
+    (nombre de lignes, synthèse par entité, nombre d'entités en rupture par date)."""
+    for chunk in iter_balance_sheets(source, fmt, chunksize):
+        batch = lcr_batch(chunk, factors)
+        breaches = batch.loc[batch["breach"], "date"].value_counts()
+        yield len(batch), summarize_entities(batch), breaches
+
+
+def hqla_after_caps(level1, level2a, level2b):
+    """Stock de HQLA après décotes et plafonds de composition (Bâle III, annexe 1).
+
+    Les montants sont déjà décotés ; renvoie (HQLA, ajustement 15 %, ajustement 40 %) :
+    ajustement 15 % = max(L2B − 15/85 × (L1 + L2A), L2B − 15/60 × L1, 0) et
+    ajustement 40 % = max(L2A + L2B − ajustement 15 % − 2/3 × L1, 0).
+    """
+    level1, level2a, level2b = (np.asarray(a, dtype=float) for a in (level1, level2a, level2b))
+    adj_15 = np.maximum.reduce([
+        level2b - LEVEL2B_CAP / (1 - LEVEL2B_CAP) * (level1 + level2a),
+        level2b - LEVEL2B_CAP / (1 - LEVEL2_CAP) * level1,
+        np.zeros_like(level2b),
+    ])
+    adj_40 = np.maximum(level2a + level2b - adj_15 - LEVEL2_CAP / (1 - LEVEL2_CAP) * level1, 0)
+    return level1 + level2a + level2b - adj_15 - adj_40, adj_15, adj_40
+
+
+def sample_positions(n, seed=0):
+    """Table synthétique de `n` positions (category, amount) couvrant toutes les catégories."""
+    rng = np.random.default_rng(seed)
+    categories = np.array(list(DEFAULT_FACTORS))
+    sides = np.array([side for side, _, _ in DEFAULT_FACTORS.values()])
+    # Poids de tirage : un bilan plausible, davantage de dépôts que de titres
+    weights = np.where(sides == "outflow", 3.0, np.where(sides == "inflow", 1.5, 1.0))
+    return pd.DataFrame({
+        "category": pd.Categorical.from_codes(
+            rng.choice(len(categories), size=n, p=weights / weights.sum()), categories
+        ),
+        "amount": rng.lognormal(0, 1, size=n).round(4),
+    })
+
+
+class LiquidityEngine:
+    """LCR calculé ligne à ligne : HQLA par niveau avec décotes et plafonds, sorties et
+    entrées par catégorie avec leurs taux.
+
+    Les positions sont agrégées une fois par catégorie (np.bincount) ; seuls les encours
+    bruts par catégorie sont conservés. Modifier un facteur ne met à jour que la catégorie
+    concernée et l'agrégat de son type (niveau HQLA, sorties ou entrées), sans relire les
+    positions ; add_positions n'agrège que les nouvelles lignes.
+    """
+
+    def __init__(self, positions=None, factors=None):
+        factors = DEFAULT_FACTORS if factors is None else factors
+        self.categories = list(factors)
+        self._codes = {c: i for i, c in enumerate(self.categories)}
+        self.sides = np.array([side for side, _, _ in factors.values()])
+        self.levels = np.array([level for _, level, _ in factors.values()])
+        self.factors = np.array([factor for _, _, factor in factors.values()], dtype=float)
+        self.gross = np.zeros(len(self.categories))
+        self.weighted = np.zeros(len(self.categories))
+        self.n_positions = 0
+        # Agrégats pondérés : un par niveau HQLA, plus les sorties et les entrées
+        self._totals = dict.fromkeys(("1", "2A", "2B", "outflow", "inflow"), 0.0)
+        if positions is not None:
+            self.add_positions(positions)
+
+    def _key(self, i):
+        return self.levels[i] if self.sides[i] == "hqla" else self.sides[i]
+
+    def _weight(self, i, factor):
+        return 1 - factor if self.sides[i] == "hqla" else factor
+
+    def add_positions(self, positions):
+        """Agrège de nouvelles positions (colonnes category, amount) aux encours existants."""
+        categories = pd.Categorical(positions["category"], categories=self.categories)
+        unknown = positions["category"][categories.isna()]
+        if len(unknown):
+            raise ValueError(f"Catégories inconnues : {', '.join(map(str, unknown.unique()[:5]))}.")
+        amounts = positions["amount"].to_numpy(dtype=float)
+        missing = ~np.isfinite(amounts)
+        if missing.any():
+            raise ValueError(f"Montants manquants ou non finis : {int(missing.sum()):,} ligne(s).".replace(",", " "))
+        gross = np.bincount(categories.codes, weights=amounts, minlength=len(self.categories))
+        for i in np.flatnonzero(gross):
+            delta = gross[i] * self._weight(i, self.factors[i])
+            self.gross[i] += gross[i]
+            self.weighted[i] += delta
+            self._totals[self._key(i)] += delta
+        self.n_positions += len(positions)
+
+    def set_factor(self, category, factor):
+        """Change la décote ou le taux d'une catégorie : mise à jour incrémentale d'un agrégat.
+
+        Un facteur non fini lève une ValueError : il rendrait l'agrégat NaN de façon définitive.
+        """
+        if not np.isfinite(factor):
+            raise ValueError(f"Facteur invalide pour {category} : {factor}.")
+        i = self._codes[category]
+        weighted = self.gross[i] * self._weight(i, factor)
+        self._totals[self._key(i)] += weighted - self.weighted[i]
+        self.weighted[i] = weighted
+        self.factors[i] = factor
+
+    def hqla(self):
+        """(HQLA après plafonds, ajustement 15 %, ajustement 40 %)."""
+        return tuple(float(v) for v in hqla_after_caps(self._totals["1"], self._totals["2A"], self._totals["2B"]))
+
+    @property
+    def outflows(self):
+        return self._totals["outflow"]
+
+    @property
+    def inflows(self):
+        return self._totals["inflow"]
+
+    def lcr(self):
+        return float(lcr_ratio(self.hqla()[0], self.outflows, self.inflows))
+
+    def summary(self):
+        """Décomposition du LCR : niveaux HQLA décotés, ajustements de plafonds, flux pondérés."""
+        hqla, adj_15, adj_40 = self.hqla()
+        rows = {
+            "Level 1": self._totals["1"],
+            "Level 2A": self._totals["2A"],
+            "Level 2B": self._totals["2B"],
+            "Ajustement plafond 15 % (L2B)": -adj_15,
+            "Ajustement plafond 40 % (L2)": -adj_40,
+            "HQLA": hqla,
+            "Sorties pondérées": self.outflows,
+            "Entrées pondérées": self.inflows,
+            "Entrées retenues (plafond 75 %)": min(INFLOW_CAP * self.outflows, self.inflows),
+            "LCR (%)": self.lcr(),
+        }
+        return pd.DataFrame({"Montant": rows}).rename_axis("")
+
+    def category_table(self):
+        """Encours brut, facteur et montant pondéré de chaque catégorie."""
+        return pd.DataFrame({
+            "Catégorie": self.categories,
+            "Type": self.sides,
+            "Niveau": self.levels,
+            "Encours brut": self.gross,
+            "Facteur": self.factors,
+            "Montant pondéré": self.weighted,
+        })
+
+
+def reverse_stress(hqla, outflow, inflow, direction):
+    """Stress inverse : plus petit multiple s ≥ 0 d'une direction de chocs relatifs
+    (dHQLA, dOutflows, dInflows), de forme (..., 3), qui ramène le LCR à 100 %.
+
+    HQLA − dénominateur vaut min(HQLA − 25 % Outflows, HQLA − Outflows + Inflows) selon le
+    régime du plafond des entrées : chaque terme est affine en s, et la rupture survient à la
+    plus petite racine positive des deux. Renvoie 0 si le LCR est déjà sous 100 %, NaN si
+    aucune rupture n'est atteinte avant qu'un montant ne devienne négatif. Calcul diffusé sur
+    autant de scénarios de base que voulu ; le choc correspondant est s × direction.
+    """
+    direction = np.asarray(direction, dtype=float)
+    d_hqla, d_out, d_in = direction[..., 0], direction[..., 1], direction[..., 2]
+    hqla, outflow, inflow = (np.asarray(a, dtype=float) for a in (hqla, outflow, inflow))
+
+    # Régime plafonné (0,25 × Outflows) puis régime non plafonné (Outflows − Inflows)
+    a_capped = hqla - (1 - INFLOW_CAP) * outflow
+    b_capped = hqla * d_hqla - (1 - INFLOW_CAP) * outflow * d_out
+    a_open = hqla - outflow + inflow
+    b_open = hqla * d_hqla - outflow * d_out + inflow * d_in
+    with np.errstate(divide="ignore", invalid="ignore"):
+        root_capped = np.where(b_capped < 0, -a_capped / b_capped, np.inf)
+        root_open = np.where(b_open < 0, -a_open / b_open, np.inf)
+        # Au-delà de s = 1 / |d|, un montant choqué deviendrait négatif
+        limit = np.min(np.where(direction < 0, -1 / direction, np.inf), axis=-1)
+    shock = np.minimum(root_capped, root_open)
+    shock = np.where(np.isfinite(shock) & (shock <= limit), shock, np.nan)
+    return np.where(np.minimum(a_capped, a_open) <= 0, 0.0, shock)
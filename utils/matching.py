@@ -0,0 +1,390 @@
+import heapq
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# En dessous de ce nombre de propositions par tour, les chaînes de rejets se déroulent
+# une à une : une file de travail en Python pur y est plus rapide que les tours vectorisés.
+SERIAL_BELOW = 64
+
+
+def rank_matrix(orders):
+    """Matrice des rangs : rank[i, orders[i, k]] = k (0 = premier choix)."""
+    orders = np.asarray(orders)
+    ranks = np.empty_like(orders)
+    ranks[np.arange(len(orders))[:, None], orders] = np.arange(orders.shape[1])
+    return ranks
+
+
+def read_preferences(source, fmt="csv"):
+    """Lit une table de préférences classées : une ligne par équipe (ou joueur), la première
+    colonne donne son nom, les suivantes ses choix du premier au dernier."""
+    if fmt == "parquet":
+        table = pd.read_parquet(source)
+    else:
+        table = pd.read_csv(source, dtype=str, keep_default_na=False, na_values=[""])
+    if table.shape[1] < 2:
+        raise ValueError("La table doit contenir un nom puis au moins un choix par ligne.")
+    # Identifiants numériques (Parquet) lus comme du texte, entiers sans « .0 », cases vides conservées
+    table = table.convert_dtypes().astype("string")
+    table = table.set_index(table.columns[0])
+    table.index = table.index.astype(str)
+    return table
+
+
+def check_unique(names):
+    """Lève une ValueError citant les premiers noms en double."""
+    names = pd.Index(names)
+    duplicated = names[names.duplicated()]
+    if len(duplicated):
+        raise ValueError(f"Noms en double : {', '.join(map(str, duplicated.unique()[:5]))}.")
+
+
+def preference_matrix(table, choices):
+    """Convertit une table de préférences (noms) en matrice d'indices dans `choices`.
+
+    La validation est vectorisée : noms en double, choix manquants ou inconnus et choix
+    répétés sur une ligne lèvent une ValueError citant les premières lignes fautives.
+    """
+    choices = pd.Index(choices)
+    check_unique(table.index)
+    check_unique(choices)
+    if table.shape[1] != len(choices):
+        raise ValueError(f"Chaque ligne doit classer les {len(choices)} choix ({table.shape[1]} colonnes).")
+    values = table.to_numpy(dtype=object)
+    codes = choices.get_indexer(values.ravel()).reshape(values.shape)
+    invalid = (codes < 0).any(axis=1)
+    if invalid.any():
+        raise ValueError(f"Choix manquants ou inconnus : {', '.join(table.index[invalid][:5])}.")
+    # Ligne complète et sans inconnu : c'est une permutation si, une fois triée, elle vaut 0..n-1
+    repeated = (np.sort(codes, axis=1) != np.arange(len(choices))).any(axis=1)
+    if repeated.any():
+        raise ValueError(f"Choix en double : {', '.join(table.index[repeated][:5])}.")
+    return codes
+
+
+def load_preferences(team_table, player_table):
+    """(équipes, joueurs, préférences des équipes, préférences des joueurs) validées."""
+    # Les deux listes de noms servent de référence à l'autre table : doublons refusés d'abord
+    check_unique(team_table.index)
+    check_unique(player_table.index)
+    teams = list(team_table.index)
+    players = list(player_table.index)
+    return teams, players, preference_matrix(team_table, players), preference_matrix(player_table, teams)
+
+
+def random_preferences(n_teams, n_players, correlation=0.0, seed=None):
+    """Préférences aléatoires (ordres des équipes, ordres des joueurs) pour les tests de charge.
+
+    Avec `correlation` > 0, chaque côté mélange une note commune à tous (popularité des
+    joueurs, attractivité des équipes) à un bruit propre à chacun : à 1, tout le monde a
+    le même classement.
+    """
+    rng = np.random.default_rng(seed)
+    common, own = np.sqrt(correlation), np.sqrt(1 - correlation)
+    team_scores = common * rng.standard_normal(n_players) + own * rng.standard_normal((n_teams, n_players))
+    player_scores = common * rng.standard_normal(n_teams) + own * rng.standard_normal((n_players, n_teams))
+    return np.argsort(-team_scores, axis=1), np.argsort(-player_scores, axis=1)
+
+
+def blocking_pairs(team_prefs, player_ranks, player_team, capacities):
+    """Paires bloquantes (équipes, joueurs) d'un matching, calculées par diffusion NumPy.
+
+    L'équipe t et le joueur p bloquent le matching si t préfère p à son moins bon retenu
+    (ou a encore une place libre) et si p préfère t à son équipe actuelle (ou n'en a pas).
+    Un matching est stable si et seulement si le résultat est vide.
+    """
+    team_ranks = rank_matrix(team_prefs)
+    player_ranks = np.asarray(player_ranks)
+    player_team = np.asarray(player_team)
+    n_teams, n_players = team_ranks.shape
+    capacities = np.broadcast_to(capacities, (n_teams,))
+
+    matched = np.flatnonzero(player_team >= 0)
+    held_by = player_team[matched]
+    # Seuil de chaque équipe : rang de son moins bon retenu, ou n_players si une place est libre
+    worst = np.full(n_teams, -1)
+    np.maximum.at(worst, held_by, team_ranks[held_by, matched])
+    worst[np.bincount(held_by, minlength=n_teams) < capacities] = n_players
+    # Rang de l'équipe actuelle de chaque joueur (n_teams s'il n'est pas affecté)
+    current = np.full(n_players, n_teams)
+    current[matched] = player_ranks[matched, held_by]
+
+    teams, players = np.nonzero((team_ranks < worst[:, None]) & (player_ranks < current[:, None]).T)
+    return teams, players
+
+
+class DeferredAcceptance:
+    """Acceptation différée (Gale-Shapley) proposée par les équipes, avec capacités.
+
+    `team_prefs[t]` liste les indices des joueurs par ordre de préférence de l'équipe t,
+    `player_ranks[p, t]` est le rang de l'équipe t pour le joueur p. Chaque équipe garde un
+    pointeur sur sa prochaine proposition : à chaque tour, toutes les équipes incomplètes
+    proposent d'un bloc à autant de joueurs qu'il leur manque de places, et chaque joueur
+    garde la meilleure offre (proposition ou équipe actuelle) par un tri lexicographique.
+    Quand il reste peu de propositions par tour, la fin se fait avec une file de travail
+    des équipes libres. Aucune proposition n'est refaite : le coût total est proportionnel
+    au nombre de propositions, et le résultat est le matching stable optimal pour les équipes.
+
+    Les capacités peuvent différer d'une équipe à l'autre. Les modifications (ajout ou
+    retrait d'un joueur, nouvelle liste de préférences, nouvelle capacité) reprennent
+    l'algorithme depuis le matching courant : les offres déjà reçues par un joueur se lisent
+    sur les pointeurs (l'équipe t a proposé à p si son rang de p est inférieur à son
+    pointeur). Une équipe en surnombre libère son moins bon joueur (tas des rangs de ses
+    membres) en reculant son pointeur jusqu'à lui, le joueur libéré se replie sur sa
+    meilleure offre restante (première équipe de sa liste qui lui a proposé), puis les équipes
+    incomplètes reprennent leurs propositions. Les matrices de rangs sont mises à jour sur
+    place plutôt que recalculées. Le matching obtenu reste stable (chaque joueur
+    garde sa meilleure offre, chaque équipe incomplète a épuisé sa liste) et déplace peu de
+    joueurs, mais il peut différer du matching optimal pour les équipes que donnerait un
+    recalcul complet (surtout après un ajout de joueur ou une baisse de capacité).
+    """
+
+    def __init__(self, team_prefs, player_ranks, capacities):
+        self.team_prefs = np.ascontiguousarray(team_prefs, dtype=np.int64)
+        self.player_ranks = np.ascontiguousarray(player_ranks, dtype=np.int64)
+        n_teams, n_players = self.team_prefs.shape
+        self.capacities = np.broadcast_to(np.asarray(capacities, dtype=np.int64), (n_teams,)).copy()
+        self.next_proposal = np.zeros(n_teams, dtype=np.int64)
+        self.held = np.zeros(n_teams, dtype=np.int64)
+        self.player_team = np.full(n_players, -1, dtype=np.int64)
+        self.proposals = 0
+        self.rounds = 0
+        self._team_ranks = None
+        self._player_prefs = None
+
+    @property
+    def n_teams(self):
+        return len(self.team_prefs)
+
+    @property
+    def n_players(self):
+        return len(self.player_ranks)
+
+    def run(self):
+        """Déroule les tours de propositions jusqu'à ce qu'aucune équipe ne puisse proposer."""
+        n_players = self.team_prefs.shape[1]
+        while True:
+            deficit = np.minimum(self.capacities - self.held, n_players - self.next_proposal)
+            active = np.flatnonzero(deficit > 0)
+            counts = deficit[active]
+            if counts.sum() < SERIAL_BELOW:
+                return self._run_serial(active)
+            teams = np.repeat(active, counts)
+            # Rang de chaque proposition dans le bloc de son équipe : 0, 1, ..., deficit − 1
+            offsets = np.arange(len(teams)) - np.repeat(np.cumsum(counts) - counts, counts)
+            players = self.team_prefs[teams, self.next_proposal[teams] + offsets]
+            self.next_proposal[active] += counts
+            self.proposals += len(teams)
+            self.rounds += 1
+
+            # Candidats de chaque joueur sollicité : les propositions et l'équipe actuelle
+            current = self.player_team[players]
+            held = current >= 0
+            cand_players = np.concatenate([players, players[held]])
+            cand_teams = np.concatenate([teams, current[held]])
+            order = np.lexsort((self.player_ranks[cand_players, cand_teams], cand_players))
+            sorted_players = cand_players[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = sorted_players[1:] != sorted_players[:-1]
+            winners_p = sorted_players[first]
+            winners_t = cand_teams[order][first]
+
+            previous = self.player_team[winners_p]
+            changed = winners_t != previous
+            self.held -= np.bincount(previous[changed & (previous >= 0)], minlength=self.n_teams)
+            self.held += np.bincount(winners_t[changed], minlength=self.n_teams)
+            self.player_team[winners_p] = winners_t
+
+    def _run_serial(self, free_teams):
+        """Termine l'algorithme équipe par équipe à partir d'une file des équipes libres."""
+        n_players = self.team_prefs.shape[1]
+        capacities = self.capacities.tolist()
+        next_proposal = self.next_proposal.tolist()
+        held = self.held.tolist()
+        player_team = self.player_team.tolist()
+        # Les memoryview lisent les matrices case par case sans créer de scalaires NumPy
+        prefs = memoryview(self.team_prefs)
+        player_ranks = memoryview(self.player_ranks)
+        work = deque(free_teams.tolist())
+        while work:
+            team = work.popleft()
+            while held[team] < capacities[team] and next_proposal[team] < n_players:
+                player = prefs[team, next_proposal[team]]
+                next_proposal[team] += 1
+                self.proposals += 1
+                current = player_team[player]
+                if current < 0 or player_ranks[player, team] < player_ranks[player, current]:
+                    player_team[player] = team
+                    held[team] += 1
+                    if current >= 0:
+                        held[current] -= 1
+                        work.append(current)
+        self.next_proposal[:] = next_proposal
+        self.held[:] = held
+        self.player_team[:] = player_team
+        return self
+
+    @property
+    def team_ranks(self):
+        """Matrice des rangs des joueurs pour chaque équipe, calculée à la demande."""
+        if self._team_ranks is None:
+            self._team_ranks = rank_matrix(self.team_prefs)
+        return self._team_ranks
+
+    @property
+    def player_prefs(self):
+        """Équipes classées par chaque joueur (inverse de player_ranks), calculé à la demande."""
+        if self._player_prefs is None:
+            self._player_prefs = np.ascontiguousarray(np.argsort(self.player_ranks, axis=1))
+        return self._player_prefs
+
+    def _settle(self, players=(), teams=()):
+        """Place chaque joueur de `players` dans sa meilleure offre et ramène chaque équipe de
+        `teams` à sa capacité, en résorbant les surnombres en chaîne.
+
+        Une équipe en surnombre libère son moins bon joueur, lu dans un tas des rangs de ses
+        membres (construit à la première visite de l'équipe, entrées périmées ignorées), et
+        recule son pointeur jusqu'à lui. Le joueur libéré rejoint la première équipe de sa
+        liste qui lui a déjà proposé. Aucun pas de la chaîne ne balaie les joueurs.
+        """
+        team_ranks = memoryview(self.team_ranks)
+        player_prefs = memoryview(self.player_prefs)
+        prefs = memoryview(self.team_prefs)
+        n_teams = self.n_teams
+        capacities = self.capacities.tolist()
+        next_proposal = self.next_proposal.tolist()
+        held = self.held.tolist()
+        player_team = self.player_team.tolist()
+        heaps = {}
+
+        def members(team):
+            # Un tableau trié est un tas : −rang croissant, le moins bon membre en tête
+            if team not in heaps:
+                matched = np.flatnonzero(self.player_team == team)
+                heaps[team] = np.sort(-self.team_ranks[team, matched]).tolist()
+            return heaps[team]
+
+        def drop_worst(team):
+            heap = members(team)
+            while True:
+                rank = -heapq.heappop(heap)
+                player = prefs[team, rank]
+                if player_team[player] == team:
+                    break
+            next_proposal[team] = rank
+            player_team[player] = -1
+            held[team] -= 1
+            return player
+
+        free = list(players)
+        for team in teams:
+            while held[team] > capacities[team]:
+                free.append(drop_worst(team))
+        while free:
+            player = free.pop()
+            team = -1
+            for i in range(n_teams):
+                candidate = player_prefs[player, i]
+                if team_ranks[candidate, player] < next_proposal[candidate]:
+                    team = candidate
+                    break
+            previous = player_team[player]
+            if team == previous:
+                continue
+            if previous >= 0:
+                held[previous] -= 1
+            player_team[player] = team
+            if team >= 0:
+                held[team] += 1
+                heapq.heappush(members(team), -team_ranks[team, player])
+                if held[team] > capacities[team]:
+                    free.append(drop_worst(team))
+        self.next_proposal[:] = next_proposal
+        self.held[:] = held
+        self.player_team[:] = player_team
+        return self
+
+    def add_player(self, positions, team_order):
+        """Ajoute un joueur, inséré au rang `positions[t]` de chaque équipe t, avec son
+        classement `team_order` des équipes, et renvoie son indice."""
+        positions = np.asarray(positions, dtype=np.int64)
+        team_order = np.asarray(team_order, dtype=np.int64)
+        player = self.n_players
+        # Insertion dans la matrice aplatie : un seul décalage mémoire pour toutes les équipes
+        flat = np.insert(self.team_prefs.ravel(), positions + np.arange(self.n_teams) * player, player)
+        self.team_prefs = flat.reshape(self.n_teams, player + 1)
+        if self._team_ranks is not None:
+            # Les joueurs classés après le point d'insertion reculent d'un rang
+            ranks = self._team_ranks
+            ranks += ranks >= positions[:, None]
+            self._team_ranks = np.hstack([ranks, positions[:, None]])
+        # Une équipe dont le pointeur a dépassé le point d'insertion a proposé au nouveau joueur
+        self.next_proposal += positions < self.next_proposal
+        self.player_ranks = np.vstack([self.player_ranks, rank_matrix([team_order])])
+        if self._player_prefs is not None:
+            self._player_prefs = np.vstack([self._player_prefs, team_order])
+        self.player_team = np.append(self.player_team, -1)
+        self._settle([player]).run()
+        return player
+
+    def remove_player(self, player):
+        """Retire un joueur : son équipe libère une place et reprend ses propositions."""
+        team = self.player_team[player]
+        if team >= 0:
+            self.held[team] -= 1
+        removed_ranks = self.team_ranks[:, player]
+        self.next_proposal -= removed_ranks < self.next_proposal
+        n_players = self.n_players
+        kept = np.delete(self.team_prefs.ravel(), removed_ranks + np.arange(self.n_teams) * n_players)
+        kept -= kept > player
+        self.team_prefs = kept.reshape(self.n_teams, n_players - 1)
+        ranks = np.delete(self.team_ranks, player, axis=1)
+        ranks -= ranks > removed_ranks[:, None]
+        self._team_ranks = ranks
+        self.player_ranks = np.delete(self.player_ranks, player, axis=0)
+        if self._player_prefs is not None:
+            self._player_prefs = np.delete(self._player_prefs, player, axis=0)
+        self.player_team = np.delete(self.player_team, player)
+        return self.run()
+
+    def set_player_prefs(self, player, team_order):
+        """Nouveau classement des équipes pour un joueur : il garde la meilleure offre reçue."""
+        team_order = np.asarray(team_order, dtype=np.int64)
+        self.player_ranks[player] = rank_matrix([team_order])[0]
+        if self._player_prefs is not None:
+            self._player_prefs[player] = team_order
+        return self._settle([player]).run()
+
+    def set_team_prefs(self, team, player_order):
+        """Nouvelle liste de préférences d'une équipe : ses propositions sont conservées
+        jusqu'au premier rang modifié, les suivantes sont annulées."""
+        player_order = np.asarray(player_order, dtype=np.int64)
+        changed = np.flatnonzero(player_order != self.team_prefs[team])
+        if not len(changed):
+            return self
+        first = changed[0]
+        self.team_prefs[team] = player_order
+        self.team_ranks[team, player_order] = np.arange(len(player_order))
+        self.next_proposal[team] = min(self.next_proposal[team], first)
+        released = np.flatnonzero((self.player_team == team) & (self.team_ranks[team] >= first))
+        return self._settle(released.tolist()).run()
+
+    def set_capacity(self, team, capacity):
+        """Nouvelle capacité d'une équipe : les places en trop libèrent ses moins bons joueurs."""
+        self.capacities[team] = capacity
+        return self._settle(teams=[team]).run()
+
+    def blocking_pairs(self):
+        """Paires bloquantes du matching courant (vide une fois `run` terminé)."""
+        return blocking_pairs(self.team_prefs, self.player_ranks, self.player_team, self.capacities)
+
+    def team_members(self):
+        """Joueurs retenus par chaque équipe, dans l'ordre de préférence de l'équipe."""
+        ranks = self.team_ranks
+        members = []
+        for team in range(self.n_teams):
+            matched = np.flatnonzero(self.player_team == team)
+            members.append(matched[np.argsort(ranks[team, matched])])
+        return members
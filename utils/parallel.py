@@ -0,0 +1,23 @@
+"""Exécution de blocs de travail sur un pool de processus, à mémoire bornée."""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def bounded_map(fn, jobs, workers, initializer=None, initargs=()):
+    """Applique `fn(*args)` à chaque tuple `args` de `jobs` sur un pool de `workers`
+    processus ; produit (args, résultat) dans l'ordre des jobs.
+
+    Au plus 2 × workers jobs sont en vol : `jobs` (souvent un générateur qui lit un
+    fichier) n'est consommé qu'au rythme des résultats, la mémoire reste donc bornée
+    quelle que soit la taille de l'entrée, et le pool ne manque jamais de travail.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for args in jobs:
+            pending.append((args, pool.submit(fn, *args)))
+            if len(pending) >= 2 * workers:
+                args, future = pending.popleft()
+                yield args, future.result()
+        while pending:
+            args, future = pending.popleft()
+            yield args, future.result()
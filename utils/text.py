@@ -0,0 +1,72 @@
+import hashlib
+import re
+from functools import lru_cache
+
+import nltk
+import numpy as np
+from nltk.corpus import stopwords
+from nltk.stem.snowball import SnowballStemmer
+
+# Un mot, précédé éventuellement d'une élision française (l', d', qu', jusqu'...) qui est écartée
+_WORD_RE = re.compile(r"(?:\b(?:[cdjlmnst]|qu|jusqu|lorsqu|puisqu)['’])?([^\W\d_]+|\d+)")
+
+
+@lru_cache(maxsize=1)
+def french_stopwords():
+    try:
+        words = stopwords.words("french")
+    except LookupError:
+        nltk.download("stopwords", quiet=True)
+        words = stopwords.words("french")
+    return frozenset(words)
+
+
+class FrenchTokenizer:
+    """Tokeniseur unique des trois méthodes : regex compilée, élisions, mots vides, racinisation.
+
+    `encode` renvoie les identifiants de tokens d'un document, mémoïsés par empreinte du
+    contenu : un même texte n'est tokenisé qu'une fois, et CountVectorizer, TF-IDF et BM25
+    reçoivent les mêmes identifiants, donc le même vocabulaire.
+    """
+
+    def __init__(self, stem=False, max_cache=500_000):
+        self.stem = stem
+        self.vocab = {}
+        self._stop = french_stopwords()
+        self._stemmer = SnowballStemmer("french") if stem else None
+        self._stems = {}
+        self._cache = {}
+        self._max_cache = max_cache
+
+    def tokenize(self, text):
+        words = [w for w in _WORD_RE.findall(text.lower()) if len(w) > 2 and w not in self._stop]
+        if self._stemmer is None:
+            return words
+        stems = self._stems
+        return [stems.get(w) or stems.setdefault(w, self._stemmer.stem(w)) for w in words]
+
+    def encode(self, text):
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        ids = self._cache.get(key)
+        if ids is None:
+            vocab = self.vocab
+            ids = np.array([vocab.setdefault(t, len(vocab)) for t in self.tokenize(text)], dtype=np.int32)
+            if len(self._cache) >= self._max_cache:
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = ids
+        return ids
+
+    def encode_query(self, text):
+        """Identifiants des tokens connus d'une requête, sans enrichir le vocabulaire ni le cache."""
+        return [self.vocab[t] for t in self.tokenize(text) if t in self.vocab]
+
+
+def token_ids(ids):
+    """Analyzer de CountVectorizer / TfidfVectorizer pour des documents déjà encodés par
+    FrenchTokenizer.encode : les identifiants sont les tokens."""
+    return ids
+
+
+def tokenize_batch(texts, stem=False):
+    tokenizer = FrenchTokenizer(stem=stem)
+    return [tokenizer.tokenize(t) for t in texts]
@@ -0,0 +1,524 @@
+"""Moteur de The Game, sans Streamlit.
+
+Règles de la page : deux piles ascendantes (départ 1) et deux descendantes (départ 100),
+cartes 2 à 99. Une carte se pose au-dessus d'une pile ascendante si elle est plus grande
+que le sommet, ou exactement 10 de moins (retour en arrière) ; symétriquement pour les
+piles descendantes. La main est complétée à 6 cartes après chaque carte jouée ; chaque tour
+exige au moins 2 cartes (1 quand la pioche est vide). Partie gagnée quand main et pioche
+sont vides, perdue quand aucune carte ne peut être jouée avant le minimum du tour.
+"""
+import base64
+import random
+import time
+from array import array
+
+import numpy as np
+import pandas as pd
+
+from utils.parallel import bounded_map
+
+N_PILES = 4
+ASCENDING = (True, True, False, False)
+START_TOPS = (1, 1, 100, 100)
+CARDS = range(2, 100)
+HAND_SIZE = 6
+JUMP = 10
+
+
+class GameState:
+    """État compact d'une partie.
+
+    Sommets des piles en entiers, main en masque de bits (bit c = carte c en main),
+    pioche mélangée une fois pour toutes dans un `array` lu par un curseur. Valider un coup
+    ou chercher un coup jouable sur une pile se fait par quelques opérations sur le masque,
+    quel que soit le nombre de cartes en main. `rng` est le générateur propre à la partie
+    (graine de la partie) où les stratégies tirent leurs choix au hasard.
+    """
+
+    __slots__ = ("tops", "hand", "deck", "cursor", "moves_this_turn", "turn_number", "seed", "rng")
+
+    def __init__(self, tops, hand, deck, cursor, moves_this_turn=0, turn_number=1, seed=None, rng=None):
+        self.tops = tops
+        self.hand = hand
+        self.deck = deck
+        self.cursor = cursor
+        self.moves_this_turn = moves_this_turn
+        self.turn_number = turn_number
+        self.seed = seed
+        self.rng = random.Random(seed) if rng is None else rng
+
+    def copy(self):
+        # La pioche n'est jamais modifiée : elle est partagée entre les copies, comme le générateur
+        return GameState(
+            list(self.tops), self.hand, self.deck, self.cursor, self.moves_this_turn, self.turn_number, self.seed,
+            self.rng,
+        )
+
+    @property
+    def deck_left(self):
+        return len(self.deck) - self.cursor
+
+    @property
+    def hand_cards(self):
+        """Cartes en main, triées."""
+        cards, hand = [], self.hand
+        while hand:
+            low = hand & -hand
+            cards.append(low.bit_length() - 1)
+            hand ^= low
+        return cards
+
+    @property
+    def cards_left(self):
+        return self.hand.bit_count() + self.deck_left
+
+    @property
+    def min_moves(self):
+        return 2 if self.deck_left else 1
+
+    @property
+    def won(self):
+        return not self.hand and not self.deck_left
+
+    @property
+    def lost(self):
+        return not self.won and self.moves_this_turn < self.min_moves and not self.can_move()
+
+    @property
+    def over(self):
+        return self.won or self.lost
+
+    def key(self):
+        """Clé hachable de la position (table de transposition, journal)."""
+        return (*self.tops, self.hand, self.cursor, self.moves_this_turn)
+
+    def is_valid(self, card, pile):
+        top = self.tops[pile]
+        if ASCENDING[pile]:
+            return card > top or card == top - JUMP
+        return card < top or card == top + JUMP
+
+    def pile_moves(self, pile):
+        """Masque des cartes de la main jouables sur `pile`."""
+        top = self.tops[pile]
+        if ASCENDING[pile]:
+            mask = -1 << (top + 1)
+            if top - JUMP > 0:
+                mask |= 1 << (top - JUMP)
+        else:
+            mask = (1 << top) - 1
+            if top + JUMP < 128:
+                mask |= 1 << (top + JUMP)
+        return self.hand & mask
+
+    def can_move(self):
+        return any(self.pile_moves(pile) for pile in range(N_PILES))
+
+    def valid_moves(self):
+        """Liste des coups (carte, pile) jouables."""
+        moves = []
+        for pile in range(N_PILES):
+            playable = self.pile_moves(pile)
+            while playable:
+                low = playable & -playable
+                moves.append((low.bit_length() - 1, pile))
+                playable ^= low
+        return moves
+
+    def play(self, card, pile):
+        """Pose `card` sur `pile` puis complète la main depuis la pioche."""
+        if not (self.hand >> card) & 1 or not self.is_valid(card, pile):
+            raise ValueError(f"Coup invalide : {card} sur la pile {pile}.")
+        self.tops[pile] = card
+        # La main est toujours pleine tant que la pioche n'est pas vide : on tire une carte
+        if self.cursor < len(self.deck):
+            self.hand ^= (1 << card) | (1 << self.deck[self.cursor])
+            self.cursor += 1
+        else:
+            self.hand ^= 1 << card
+        self.moves_this_turn += 1
+
+    def end_turn(self):
+        if self.moves_this_turn < self.min_moves:
+            raise ValueError(f"Il faut jouer au moins {self.min_moves} carte(s) avant de finir le tour.")
+        self.moves_this_turn = 0
+        self.turn_number += 1
+
+
+def new_game(seed=None):
+    """Nouvelle partie : pioche mélangée selon `seed` (tirée au hasard si absente, et conservée
+    dans l'état pour rejouer la partie), main de 6 cartes."""
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(63)
+    deck = list(CARDS)
+    random.Random(seed).shuffle(deck)
+    hand = 0
+    for card in deck[:HAND_SIZE]:
+        hand |= 1 << card
+    return GameState(list(START_TOPS), hand, array("B", deck), HAND_SIZE, seed=seed)
+
+
+def gap(top, card, ascending):
+    """Écart consommé par un coup : 0 pour un retour en arrière de 10."""
+    if ascending:
+        return card - top if card > top else 0
+    return top - card if card < top else 0
+
+
+def greedy_move(state):
+    """IA gloutonne de la page : coup à plus petit écart, retours en arrière en priorité.
+
+    Sur chaque pile, le meilleur candidat est soit la carte de retour en arrière, soit la
+    carte la plus proche du sommet : il se lit directement dans le masque de la main.
+    Égalités départagées par ordre des piles. None si aucun coup n'est jouable.
+    """
+    hand = state.hand
+    best_gap, best = 100, None
+    for pile, top in enumerate(state.tops):
+        if pile < 2:  # piles ascendantes
+            if top > JUMP and (hand >> (top - JUMP)) & 1:
+                return top - JUMP, pile
+            above = hand >> (top + 1)
+            if above:
+                card_gap = (above & -above).bit_length()
+                if card_gap < best_gap:
+                    best_gap, best = card_gap, (top + card_gap, pile)
+        else:
+            if top + JUMP < 100 and (hand >> (top + JUMP)) & 1:
+                return top + JUMP, pile
+            below = hand & ((1 << top) - 1)
+            if below:
+                card_gap = top + 1 - below.bit_length()
+                if card_gap < best_gap:
+                    best_gap, best = card_gap, (top - card_gap, pile)
+    return best
+
+
+def play_greedy(state):
+    """Joue la partie jusqu'au bout avec greedy_move, coup pour coup, sans passer par
+    iter_game : sommets, main et curseur restent dans des variables locales, les coups ne
+    sont ni revalidés ni construits en tuples. Met à jour `state` et le renvoie."""
+    a1, a2, d1, d2 = state.tops
+    hand, deck, cursor = state.hand, state.deck, state.cursor
+    moves, turn, n = state.moves_this_turn, state.turn_number, len(deck)
+    while hand or cursor < n:
+        # Retours en arrière d'abord, dans l'ordre des piles, puis le plus petit écart
+        if a1 > JUMP and (hand >> (a1 - JUMP)) & 1:
+            card = a1 = a1 - JUMP
+        elif a2 > JUMP and (hand >> (a2 - JUMP)) & 1:
+            card = a2 = a2 - JUMP
+        elif d1 + JUMP < 100 and (hand >> (d1 + JUMP)) & 1:
+            card = d1 = d1 + JUMP
+        elif d2 + JUMP < 100 and (hand >> (d2 + JUMP)) & 1:
+            card = d2 = d2 + JUMP
+        else:
+            best_gap, pile = 100, -1
+            above = hand >> (a1 + 1)
+            if above:
+                best_gap, pile = (above & -above).bit_length(), 0
+            above = hand >> (a2 + 1)
+            if above and (above & -above).bit_length() < best_gap:
+                best_gap, pile = (above & -above).bit_length(), 1
+            below = hand & ((1 << d1) - 1)
+            if below and d1 + 1 - below.bit_length() < best_gap:
+                best_gap, pile = d1 + 1 - below.bit_length(), 2
+            below = hand & ((1 << d2) - 1)
+            if below and d2 + 1 - below.bit_length() < best_gap:
+                best_gap, pile = d2 + 1 - below.bit_length(), 3
+            if pile < 0:
+                # Aucun coup : fin de tour si le minimum est atteint, sinon partie perdue
+                if moves < (2 if cursor < n else 1):
+                    break
+                moves, turn = 0, turn + 1
+                continue
+            if pile == 0:
+                card = a1 = a1 + best_gap
+            elif pile == 1:
+                card = a2 = a2 + best_gap
+            elif pile == 2:
+                card = d1 = d1 - best_gap
+            else:
+                card = d2 = d2 - best_gap
+        hand ^= 1 << card
+        if cursor < n:
+            hand |= 1 << deck[cursor]
+            cursor += 1
+        moves += 1
+    state.tops[:] = a1, a2, d1, d2
+    state.hand, state.cursor, state.moves_this_turn, state.turn_number = hand, cursor, moves, turn
+    return state
+
+
+def iter_game(strategy, state):
+    """Joue la partie jusqu'au bout en appliquant `strategy` à `state` ; produit chaque coup
+    (carte, pile) après l'avoir joué, et None à chaque fin de tour.
+
+    `strategy(state)` renvoie un coup, ou None pour finir le tour ; elle doit renvoyer None
+    quand aucun coup n'est jouable. Un None avant le minimum du tour termine la partie (perdue).
+    """
+    while state.hand or state.cursor < len(state.deck):
+        move = strategy(state)
+        if move is None:
+            if state.moves_this_turn < state.min_moves:
+                return
+            state.end_turn()
+        else:
+            state.play(*move)
+        yield move
+
+
+def play_game(strategy=greedy_move, seed=None, state=None):
+    """Joue une partie complète (cf. iter_game) et renvoie l'état final."""
+    state = new_game(seed) if state is None else state
+    if strategy is greedy_move:
+        return play_greedy(state)
+    for _ in iter_game(strategy, state):
+        pass
+    return state
+
+
+class GameLog:
+    """Journal compact d'une partie : la graine et 2 octets par action (carte, pile), une fin
+    de tour s'écrivant (0, 0). Toute position se reconstruit en rejouant le journal ; un
+    instantané de l'état est gardé toutes les `snapshot_every` actions pour que seek(k) ne
+    rejoue qu'au plus snapshot_every − 1 actions.
+
+    `state` est la position courante : play et end_turn la font avancer et journalisent
+    l'action, record journalise une action déjà appliquée (cf. iter_game).
+    """
+
+    def __init__(self, seed=None, actions=b"", snapshot_every=16):
+        self.state = new_game(seed)
+        self.seed = self.state.seed
+        self.snapshot_every = snapshot_every
+        self.actions = bytearray()
+        self._snapshots = [self.state.copy()]
+        for i in range(0, len(actions) - 1, 2):
+            card, pile = actions[i], actions[i + 1]
+            if card:
+                self.play(card, pile)
+            else:
+                self.end_turn()
+
+    def __len__(self):
+        return len(self.actions) // 2
+
+    def record(self, move):
+        self.actions += bytes(move) if move is not None else b"\0\0"
+        if len(self) % self.snapshot_every == 0:
+            self._snapshots.append(self.state.copy())
+
+    def play(self, card, pile):
+        self.state.play(card, pile)
+        self.record((card, pile))
+
+    def end_turn(self):
+        self.state.end_turn()
+        self.record(None)
+
+    def moves(self):
+        """Actions journalisées : (carte, pile), ou None pour une fin de tour."""
+        return [
+            (self.actions[i], self.actions[i + 1]) if self.actions[i] else None
+            for i in range(0, len(self.actions), 2)
+        ]
+
+    def seek(self, k):
+        """Position après les k premières actions, depuis l'instantané le plus proche."""
+        k = max(0, min(k, len(self)))
+        state = self._snapshots[k // self.snapshot_every].copy()
+        for i in range(2 * (k - k % self.snapshot_every), 2 * k, 2):
+            card, pile = self.actions[i], self.actions[i + 1]
+            if card:
+                state.play(card, pile)
+            else:
+                state.end_turn()
+        return state
+
+    def to_code(self):
+        """Code de partage : graine (8 octets) puis actions, en base64 URL."""
+        return base64.urlsafe_b64encode(self.seed.to_bytes(8, "big") + bytes(self.actions)).decode()
+
+    @classmethod
+    def from_code(cls, code):
+        """Journal reconstruit depuis un code de partage ; ValueError si le code est invalide."""
+        try:
+            data = base64.urlsafe_b64decode(code.strip().encode())
+        except (ValueError, TypeError):
+            raise ValueError("Code de partie illisible.") from None
+        if len(data) < 8 or len(data) % 2:
+            raise ValueError("Code de partie illisible.")
+        try:
+            return cls(int.from_bytes(data[:8], "big"), data[8:])
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Code de partie invalide : {e}") from None
+
+
+def record_game(strategy=greedy_move, seed=None):
+    """Joue une partie complète et renvoie son journal (même tirage que play_games : les
+    stratégies au hasard tirent dans le générateur de la partie, state.rng)."""
+    log = GameLog(seed)
+    for move in iter_game(strategy, log.state):
+        log.record(move)
+    return log
+
+
+def random_move(state):
+    """Référence : un coup jouable au hasard, tiré du générateur de la partie (state.rng)."""
+    moves = state.valid_moves()
+    return state.rng.choice(moves) if moves else None
+
+
+class LookaheadAI:
+    """IA à anticipation : cherche la meilleure séquence d'un tour complet (au moins
+    `min_moves` cartes, jusqu'à `depth`) avec les cartes déjà en main, retours en arrière
+    compris, et joue son premier coup.
+
+    Chaque carte coûte son écart moins une « part » de la place restante
+    (place des quatre piles / cartes à placer) : une carte plus économique que la moyenne
+    rapporte, un retour en arrière rapporte 10 de place en plus. La recherche en profondeur
+    est bornée par `width` candidats par pile (retour en arrière et cartes les plus proches)
+    et mémorise chaque position dans une table de transposition (piles de même sens
+    interchangeables). Sous un budget de `time_budget` secondes par coup : un tour minimal
+    est toujours cherché, la profondeur `depth` seulement si le budget le permet — les coups
+    dépendent alors de la charge de la machine. Avec `time_budget=None` la recherche va
+    toujours jusqu'à `depth` et la stratégie est déterministe.
+    """
+
+    def __init__(self, depth=3, width=2, time_budget=0.05):
+        self.depth = depth
+        self.width = width
+        self.time_budget = time_budget
+
+    def _candidates(self, tops, hand):
+        """Coups retenus (écart, carte, pile) : par pile, le retour en arrière et les `width`
+        cartes les plus proches du sommet."""
+        moves = []
+        for pile, top in enumerate(tops):
+            if pile < 2:
+                if top > JUMP and (hand >> (top - JUMP)) & 1:
+                    moves.append((-JUMP, top - JUMP, pile))
+                playable = hand >> (top + 1)
+                for _ in range(self.width):
+                    if not playable:
+                        break
+                    low = playable & -playable
+                    card_gap = low.bit_length()
+                    moves.append((card_gap, top + card_gap, pile))
+                    playable ^= low
+            else:
+                if top + JUMP < 100 and (hand >> (top + JUMP)) & 1:
+                    moves.append((-JUMP, top + JUMP, pile))
+                playable = hand & ((1 << top) - 1)
+                for _ in range(self.width):
+                    if not playable:
+                        break
+                    card = playable.bit_length() - 1
+                    moves.append((top - card, card, pile))
+                    playable ^= 1 << card
+        # Écarts croissants : à coût égal, la séquence qui commence par le plus petit écart l'emporte
+        moves.sort()
+        return moves
+
+    def _search(self, tops, hand, depth, required, par, table, deadline):
+        """Meilleur coût (et premier coup) des séquences de `required` à `depth` cartes."""
+        a1, a2, d1, d2 = tops
+        key = (a1, a2, d1, d2) if a1 <= a2 else (a2, a1, d1, d2)
+        if d1 > d2:
+            key = (key[0], key[1], d2, d1)
+        key += (hand, depth, required)
+        best = table.get(key)
+        if best is not None:
+            return best
+        if time.perf_counter() > deadline:
+            raise TimeoutError
+        best = (0.0, None) if required <= 0 else (float("inf"), None)
+        if depth > 0:
+            for card_gap, card, pile in self._candidates(tops, hand):
+                cost = self._search(
+                    tops[:pile] + (card,) + tops[pile + 1:], hand ^ (1 << card),
+                    depth - 1, required - 1, par, table, deadline,
+                )[0] + card_gap - par
+                if cost < best[0]:
+                    best = (cost, (card, pile))
+        table[key] = best
+        return best
+
+    def __call__(self, state):
+        if not state.can_move():
+            return None
+        deadline = float("inf") if self.time_budget is None else time.perf_counter() + self.time_budget
+        tops = tuple(state.tops)
+        room = (99 - tops[0]) + (99 - tops[1]) + (tops[2] - 2) + (tops[3] - 2)
+        par = max(room, 0) / state.cards_left
+        # Un tour minimal d'abord (peu coûteux), puis la profondeur complète si le budget le permet
+        move = None
+        for depth in sorted({state.min_moves, self.depth}):
+            try:
+                _, best = self._search(tops, state.hand, depth, min(state.min_moves, depth), par, {}, deadline)
+            except TimeoutError:
+                break
+            # Sans séquence assez longue à cette profondeur, on garde au moins un coup jouable
+            if best is not None:
+                move = best
+        return move if move is not None else greedy_move(state)
+
+
+# Stratégies disponibles pour les tournois, par nom (transmis tel quel aux processus)
+STRATEGIES = {
+    "Glouton (plus petit écart)": greedy_move,
+    # Sans budget de temps : les coups ne dépendent que de la position, une partie de tournoi
+    # se rejoue donc à l'identique depuis sa graine quelle que soit la charge de la machine
+    "Anticipation (1 tour)": LookaheadAI(time_budget=None),
+    "Aléatoire": random_move,
+}
+
+
+def play_games(strategy_name, seeds):
+    """Joue une partie par graine ; renvoie (cartes restantes de chaque partie, durée en s)."""
+    strategy = STRATEGIES[strategy_name]
+    cards_left = array("B")
+    start = time.perf_counter()
+    for seed in seeds:
+        cards_left.append(play_game(strategy, seed).cards_left)
+    return cards_left, time.perf_counter() - start
+
+
+def tournament(strategy_names, n_games, seed=0, workers=1, chunksize=500):
+    """Joue `n_games` parties par stratégie, sur les mêmes graines seed .. seed + n_games − 1.
+
+    Produit (stratégie, cartes restantes, durée de calcul) au fil des blocs de `chunksize`
+    parties, joués sur un pool de processus si workers > 1.
+    """
+    jobs = (
+        (name, range(start, min(start + chunksize, seed + n_games)))
+        for name in strategy_names
+        for start in range(seed, seed + n_games, chunksize)
+    )
+    if workers <= 1:
+        for name, seeds in jobs:
+            yield name, *play_games(name, seeds)
+        return
+
+    for (name, _), result in bounded_map(play_games, jobs, workers):
+        yield name, *result
+
+
+def tournament_summary(results, elapsed=None):
+    """Synthèse par stratégie : parties, taux de victoire, cartes restantes (moyenne, médiane,
+    9e décile) et débit par processus si `elapsed` (secondes de calcul par stratégie) est fourni."""
+    rows = []
+    for name, cards_left in results.items():
+        cards_left = np.asarray(cards_left)
+        row = {
+            "Stratégie": name,
+            "Parties": len(cards_left),
+            "Victoires (%)": round(100 * np.mean(cards_left == 0), 3),
+            "Cartes restantes (moy.)": round(cards_left.mean(), 2),
+            "Médiane": np.median(cards_left),
+            "9e décile": np.quantile(cards_left, 0.9),
+        }
+        if elapsed is not None:
+            row["Parties/s par processus"] = round(len(cards_left) / elapsed[name])
+        rows.append(row)
+    return pd.DataFrame(rows)